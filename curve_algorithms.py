@@ -1,15 +1,27 @@
 """
 参数曲线算法模块
 实现经典参数曲线算法：Bézier曲线、B样条曲线
-不使用外部库，完全手动实现
+算法均手动实现，NumPy仅用于批量矩阵运算
 """
 from PyQt5.QtCore import QPoint
 import math
+from array import array
+from bisect import bisect_right
+import numpy as np
+from lru_cache import LRUCache
 
 
 class CurveAlgorithms:
     """参数曲线算法类"""
     
+    # 预计算表的缓存条目数上限：采样数随视图缩放、细节层次变化，只保留最近用到的
+    CACHE_CAPACITY = 64
+    
+    # Bernstein基矩阵缓存 {(degree, num_samples): ndarray}
+    _bernstein_matrix_cache = LRUCache(CACHE_CAPACITY)
+    # B样条基函数表缓存 {(knots, degree, num_samples): (spans, basis)}
+    _b_spline_table_cache = LRUCache(CACHE_CAPACITY)
+    
     @staticmethod
     def factorial(n):
         """计算阶乘"""
@@ -64,6 +76,236 @@ class CurveAlgorithms:
         
         return curve_points
     
+    @staticmethod
+    def bernstein_matrix(degree, num_samples):
+        """
+        计算Bernstein基矩阵（按 (次数, 采样数) 缓存）
+        第i行为 t_i = i / num_samples 处的全部基函数值 B_{0,n}(t_i) ... B_{n,n}(t_i)
+        :param degree: 曲线次数n
+        :param num_samples: 采样点数量
+        :return: 形状为 (num_samples+1, degree+1) 的只读矩阵
+        """
+        key = (degree, num_samples)
+        matrix = CurveAlgorithms._bernstein_matrix_cache.get(key)
+        if matrix is None:
+            matrix = CurveAlgorithms.bernstein_matrix_at(degree, np.arange(num_samples + 1) / num_samples)
+            matrix.setflags(write=False)
+            CurveAlgorithms._bernstein_matrix_cache[key] = matrix
+        return matrix
+    
+    @staticmethod
+    def bernstein_matrix_at(degree, parameters):
+        """
+        计算任意参数处的Bernstein基矩阵（不缓存，用于非均匀采样）
+        :param degree: 曲线次数n
+        :param parameters: 参数值序列 [t_0, t_1, ...]，取值 [0, 1]
+        :return: 形状为 (len(parameters), degree+1) 的矩阵
+        """
+        t = np.asarray(parameters, dtype=float)[:, None]
+        j = np.arange(degree + 1)
+        coefficients = np.array(
+            [CurveAlgorithms.binomial_coefficient(degree, i) for i in range(degree + 1)],
+            dtype=float
+        )
+        return coefficients * t ** j * (1 - t) ** (degree - j)
+    
+    @staticmethod
+    def points_to_array(points):
+        """
+        将QPoint列表转换为坐标数组
+        :param points: 点列表 [QPoint, ...]
+        :return: 形状为 (N, 2) 的浮点数组
+        """
+        return np.array([(p.x(), p.y()) for p in points], dtype=float).reshape(-1, 2)
+    
+    @staticmethod
+    def array_to_points(array):
+        """
+        将坐标数组转换为QPoint列表（坐标向零取整，与标量算法一致）
+        :param array: 形状为 (N, 2) 的数组
+        :return: 点列表 [QPoint, ...]
+        """
+        return [QPoint(x, y) for x, y in array.astype(int).tolist()]
+    
+    @staticmethod
+    def format_points(coords, as_array=False):
+        """
+        按需要的形式输出曲线点
+        :param coords: 形状为 (N, 2) 的浮点坐标数组
+        :param as_array: True时直接返回浮点数组（保留亚像素精度），否则返回QPoint列表
+        :return: 坐标数组或点列表
+        """
+        if as_array:
+            return coords
+        return CurveAlgorithms.array_to_points(coords)
+    
+    @staticmethod
+    def bezier_curve_matrix(control_points, num_samples=100, as_array=False):
+        """
+        使用缓存的Bernstein基矩阵计算Bézier曲线
+        整条曲线为一次矩阵乘法：C = B · P，
+        与 bezier_curve_bernstein 结果一致，后者保留作为参考实现
+        :param control_points: 控制点列表 [QPoint, QPoint, ...]
+        :param num_samples: 采样点数量
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        if len(control_points) < 2:
+            return CurveAlgorithms.format_points(np.empty((0, 2)), as_array)
+        
+        basis = CurveAlgorithms.bernstein_matrix(len(control_points) - 1, num_samples)
+        curve = basis @ CurveAlgorithms.points_to_array(control_points)
+        return CurveAlgorithms.format_points(curve, as_array)
+    
+    @staticmethod
+    def split_bezier(control_points, t=0.5):
+        """
+        de Casteljau分割：在参数t处把Bézier曲线分成两段
+        :param control_points: 控制点坐标列表 [(x, y), ...]
+        :param t: 分割参数
+        :return: (左段控制点, 右段控制点)
+        """
+        points = list(control_points)
+        left = [points[0]]
+        right = [points[-1]]
+        while len(points) > 1:
+            points = [((1 - t) * a[0] + t * b[0], (1 - t) * a[1] + t * b[1])
+                      for a, b in zip(points, points[1:])]
+            left.append(points[0])
+            right.append(points[-1])
+        right.reverse()
+        return left, right
+    
+    @staticmethod
+    def bezier_flatness(control_points):
+        """
+        计算Bézier曲线的平坦度：内部控制点到首末点弦线段的最大距离
+        由凸包性质，曲线与弦线段的偏差不超过该值；
+        按线段（投影参数截断到[0, 1]）而不是无限长直线计算，
+        沿弦方向越过端点的控制点同样计入
+        :param control_points: 控制点坐标列表 [(x, y), ...]
+        :return: 平坦度（场景坐标单位）
+        """
+        x0, y0 = control_points[0]
+        x1, y1 = control_points[-1]
+        dx = x1 - x0
+        dy = y1 - y0
+        chord_squared = dx * dx + dy * dy
+        
+        flatness = 0.0
+        for x, y in control_points[1:-1]:
+            if chord_squared < 1e-20:
+                t = 0.0
+            else:
+                t = min(1.0, max(0.0, ((x - x0) * dx + (y - y0) * dy) / chord_squared))
+            distance = math.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+            flatness = max(flatness, distance)
+        return flatness
+    
+    @staticmethod
+    def flatten_bezier_coords(control_points, tolerance, max_depth=12):
+        """
+        自适应展平Bézier曲线（坐标形式）
+        :param control_points: 控制点坐标列表 [(x, y), ...]
+        :param tolerance: 场景坐标下的平坦度容差
+        :param max_depth: 最大细分深度
+        :return: 折线顶点坐标列表 [(x, y), ...]
+        """
+        coords = [tuple(control_points[0])]
+        # 栈中先压右段，保证按参数顺序输出
+        stack = [(list(control_points), 0)]
+        while stack:
+            segment, depth = stack.pop()
+            if depth >= max_depth or CurveAlgorithms.bezier_flatness(segment) <= tolerance:
+                coords.append(segment[-1])
+            else:
+                left, right = CurveAlgorithms.split_bezier(segment)
+                stack.append((right, depth + 1))
+                stack.append((left, depth + 1))
+        return coords
+    
+    @staticmethod
+    def flatten_bezier_adaptive(control_points, tolerance=0.5, scale=1.0, as_array=False):
+        """
+        按屏幕空间容差自适应展平Bézier曲线
+        反复进行de Casteljau二分，直到每段在屏幕上的偏差不超过tolerance
+        :param control_points: 控制点列表 [QPoint, ...]
+        :param tolerance: 屏幕空间容差（像素）
+        :param scale: 当前视图缩放因子
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        if len(control_points) < 2:
+            return CurveAlgorithms.format_points(np.empty((0, 2)), as_array)
+        
+        coords = CurveAlgorithms.flatten_bezier_coords(
+            [(p.x(), p.y()) for p in control_points], tolerance / scale)
+        return CurveAlgorithms.format_points(np.array(coords, dtype=float), as_array)
+    
+    @staticmethod
+    def bezier_forward_difference(control_points, num_samples=100, as_array=False):
+        """
+        使用前向差分法计算二次/三次Bézier曲线
+        将曲线化为幂基多项式，步长固定时各阶差分只需计算一次，
+        之后每个采样点仅用加法递推得到；其他次数退回矩阵方法
+        :param control_points: 控制点列表（3个或4个）
+        :param num_samples: 采样点数量
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        n = len(control_points) - 1
+        if n not in (2, 3):
+            return CurveAlgorithms.bezier_curve_matrix(control_points, num_samples, as_array)
+        
+        h = 1.0 / num_samples
+        h2 = h * h
+        h3 = h2 * h
+        
+        # 每个坐标分量的初值及一、二、三阶差分
+        differences = []
+        for coords in ([p.x() for p in control_points], [p.y() for p in control_points]):
+            if n == 2:
+                p0, p1, p2 = coords
+                b = p0 - 2 * p1 + p2
+                c = 2 * (p1 - p0)
+                differences.append([p0, b * h2 + c * h, 2 * b * h2, 0.0])
+            else:
+                p0, p1, p2, p3 = coords
+                a = -p0 + 3 * p1 - 3 * p2 + p3
+                b = 3 * p0 - 6 * p1 + 3 * p2
+                c = 3 * (p1 - p0)
+                differences.append([p0, a * h3 + b * h2 + c * h, 6 * a * h3 + 2 * b * h2, 6 * a * h3])
+        
+        x, dx1, dx2, dx3 = differences[0]
+        y, dy1, dy2, dy3 = differences[1]
+        coords = array('d')
+        for _ in range(num_samples):
+            coords.append(x)
+            coords.append(y)
+            x += dx1
+            dx1 += dx2
+            dx2 += dx3
+            y += dy1
+            dy1 += dy2
+            dy2 += dy3
+        # 终点直接取末控制点，避免累积误差
+        coords.append(control_points[-1].x())
+        coords.append(control_points[-1].y())
+        
+        return CurveAlgorithms.format_points(np.frombuffer(coords).reshape(-1, 2), as_array)
+    
+    @staticmethod
+    def bezier_curves_batch(control_arrays, num_samples=100):
+        """
+        批量计算同次数Bézier曲线
+        所有曲线共用一个Bernstein基矩阵，一次张量运算求出全部曲线
+        :param control_arrays: 控制点数组，形状 (K, degree+1, 2)
+        :param num_samples: 采样点数量
+        :return: 曲线点数组，形状 (K, num_samples+1, 2)
+        """
+        basis = CurveAlgorithms.bernstein_matrix(control_arrays.shape[1] - 1, num_samples)
+        return np.einsum('sj,kjd->ksd', basis, control_arrays)
+    
     @staticmethod
     def de_casteljau(control_points, t):
         """
@@ -75,6 +317,17 @@ class CurveAlgorithms:
         if not control_points:
             return None
         
+        x, y = CurveAlgorithms.de_casteljau_coords(control_points, t)
+        return QPoint(int(x), int(y))
+    
+    @staticmethod
+    def de_casteljau_coords(control_points, t):
+        """
+        de Casteljau递推，返回浮点坐标
+        :param control_points: 控制点列表（非空）
+        :param t: 参数值 [0, 1]
+        :return: 曲线上的点坐标 (x, y)
+        """
         # 创建工作数组（避免修改原始控制点）
         points = [[p.x(), p.y()] for p in control_points]
         n = len(points)
@@ -85,27 +338,26 @@ class CurveAlgorithms:
                 points[i][0] = (1 - t) * points[i][0] + t * points[i + 1][0]
                 points[i][1] = (1 - t) * points[i][1] + t * points[i + 1][1]
         
-        return QPoint(int(points[0][0]), int(points[0][1]))
+        return points[0][0], points[0][1]
     
     @staticmethod
-    def bezier_curve_de_casteljau(control_points, num_samples=100):
+    def bezier_curve_de_casteljau(control_points, num_samples=100, as_array=False):
         """
         使用de Casteljau算法计算Bézier曲线
         :param control_points: 控制点列表
         :param num_samples: 采样点数量
-        :return: 曲线上的点列表
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
         """
         if len(control_points) < 2:
-            return []
+            return CurveAlgorithms.format_points(np.empty((0, 2)), as_array)
         
-        curve_points = []
+        coords = array('d')
         for i in range(num_samples + 1):
             t = i / num_samples
-            point = CurveAlgorithms.de_casteljau(control_points, t)
-            if point:
-                curve_points.append(point)
+            coords.extend(CurveAlgorithms.de_casteljau_coords(control_points, t))
         
-        return curve_points
+        return CurveAlgorithms.format_points(np.frombuffer(coords).reshape(-1, 2), as_array)
     
     @staticmethod
     def b_spline_basis(i, k, t, knots):
@@ -149,6 +401,126 @@ class CurveAlgorithms:
         
         return term1 + term2
     
+    @staticmethod
+    def find_knot_span(n, degree, t, knots):
+        """
+        二分查找参数t所在的节点区间
+        :param n: 控制点数量
+        :param degree: B样条次数
+        :param t: 参数值
+        :param knots: 节点向量
+        :return: 区间索引span，满足 knots[span] <= t < knots[span+1]
+        """
+        # 末端参数归入最后一个非空区间
+        if t >= knots[n]:
+            return n - 1
+        if t <= knots[degree]:
+            return degree
+        
+        low = degree
+        high = n
+        mid = (low + high) // 2
+        while t < knots[mid] or t >= knots[mid + 1]:
+            if t < knots[mid]:
+                high = mid
+            else:
+                low = mid
+            mid = (low + high) // 2
+        return mid
+    
+    @staticmethod
+    def b_spline_basis_functions(span, t, degree, knots):
+        """
+        三角表法计算区间span上全部非零的B样条基函数
+        一次计算得到 N_{span-degree,degree}(t) ... N_{span,degree}(t)，无递归
+        :param span: 节点区间索引（由find_knot_span得到）
+        :param t: 参数值
+        :param degree: B样条次数
+        :param knots: 节点向量
+        :return: 长度为degree+1的基函数值列表
+        """
+        basis = [0.0] * (degree + 1)
+        left = [0.0] * (degree + 1)
+        right = [0.0] * (degree + 1)
+        basis[0] = 1.0
+        
+        for j in range(1, degree + 1):
+            left[j] = t - knots[span + 1 - j]
+            right[j] = knots[span + j] - t
+            saved = 0.0
+            for r in range(j):
+                temp = basis[r] / (right[r + 1] + left[j - r])
+                basis[r] = saved + right[r + 1] * temp
+                saved = left[j - r] * temp
+            basis[j] = saved
+        
+        return basis
+    
+    @staticmethod
+    def b_spline_parameters(knots, degree, num_samples):
+        """
+        生成B样条曲线的均匀采样参数
+        :param knots: 节点向量
+        :param degree: B样条次数
+        :param num_samples: 采样点数量
+        :return: 参数值列表；参数范围为空时返回空列表
+        """
+        n = len(knots) - degree - 1
+        t_min = knots[degree]
+        t_max = knots[n]
+        if t_min >= t_max:
+            return []
+        
+        params = []
+        for i in range(num_samples + 1):
+            if i == num_samples:
+                t = t_max - 1e-10  # 避免精确等于t_max时的边界问题
+            else:
+                t = t_min + (t_max - t_min) * i / num_samples
+            params.append(max(t_min, min(t, t_max - 1e-10)))
+        return params
+    
+    @staticmethod
+    def b_spline_basis_table(knots, degree, num_samples):
+        """
+        计算并缓存B样条基函数表（按 (节点向量, 次数, 采样数) 缓存）
+        :param knots: 节点向量
+        :param degree: B样条次数
+        :param num_samples: 采样点数量
+        :return: (spans, basis)
+                 spans: 每个采样点所在的节点区间，形状 (S,)
+                 basis: 每个采样点的非零基函数值，形状 (S, degree+1)
+        """
+        key = (tuple(knots), degree, num_samples)
+        table = CurveAlgorithms._b_spline_table_cache.get(key)
+        if table is None:
+            n = len(knots) - degree - 1
+            params = CurveAlgorithms.b_spline_parameters(knots, degree, num_samples)
+            spans = np.empty(len(params), dtype=int)
+            basis = np.empty((len(params), degree + 1))
+            for i, t in enumerate(params):
+                span = CurveAlgorithms.find_knot_span(n, degree, t, knots)
+                spans[i] = span
+                basis[i] = CurveAlgorithms.b_spline_basis_functions(span, t, degree, knots)
+            spans.setflags(write=False)
+            basis.setflags(write=False)
+            table = (spans, basis)
+            CurveAlgorithms._b_spline_table_cache[key] = table
+        return table
+    
+    @staticmethod
+    def generate_knots(n, k, knot_type='clamped'):
+        """
+        按类型生成节点向量
+        :param n: 控制点数量
+        :param k: B样条次数
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 节点向量
+        """
+        if knot_type == 'uniform':
+            return CurveAlgorithms.generate_uniform_knots(n, k)
+        return CurveAlgorithms.generate_clamped_knots(n, k)
+    
     @staticmethod
     def generate_uniform_knots(n, k):
         """
@@ -192,9 +564,63 @@ class CurveAlgorithms:
         return knots
     
     @staticmethod
-    def b_spline_curve(control_points, degree=3, num_samples=100, knot_type='clamped'):
+    def b_spline_curve(control_points, degree=3, num_samples=100, knot_type='clamped',
+                       as_array=False):
+        """
+        计算B样条曲线（de Boor三角表法）
+        每个采样点只计算degree+1个非零基函数，基函数表按节点向量缓存复用
+        :param control_points: 控制点列表
+        :param degree: B样条次数（2=二次，3=三次）
+        :param num_samples: 采样点数量
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        curve = CurveAlgorithms.b_spline_curve_array(
+            CurveAlgorithms.points_to_array(control_points), degree, num_samples, knot_type)
+        
+        # 防止异常大的值
+        valid = np.all(np.abs(curve) < 1e8, axis=1)
+        return CurveAlgorithms.format_points(curve[valid], as_array)
+    
+    @staticmethod
+    def b_spline_curve_array(control_array, degree=3, num_samples=100, knot_type='clamped'):
+        """
+        计算B样条曲线（数组形式，不做取整）
+        :param control_array: 控制点数组，形状 (n, 2)
+        :param degree: B样条次数
+        :param num_samples: 采样点数量
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 曲线点数组，形状 (S, 2)
+        """
+        n = len(control_array)
+        if n < degree + 1:
+            return np.empty((0, 2))
+        
+        knots = CurveAlgorithms.generate_knots(n, degree, knot_type)
+        spans, basis = CurveAlgorithms.b_spline_basis_table(knots, degree, num_samples)
+        if len(spans) == 0:
+            return np.empty((0, 2))
+        return CurveAlgorithms.evaluate_b_spline_table(control_array, spans, basis)
+    
+    @staticmethod
+    def evaluate_b_spline_table(control_array, spans, basis):
+        """
+        用基函数表计算B样条曲线点
+        :param control_array: 控制点数组，形状 (n, 2)
+        :param spans: 采样点所在区间，形状 (S,)
+        :param basis: 非零基函数值，形状 (S, degree+1)
+        :return: 曲线点数组，形状 (S, 2)
+        """
+        degree = basis.shape[1] - 1
+        indices = spans[:, None] - degree + np.arange(degree + 1)
+        return np.einsum('sk,skd->sd', basis, control_array[indices])
+    
+    @staticmethod
+    def b_spline_curve_cox_de_boor(control_points, degree=3, num_samples=100, knot_type='clamped'):
         """
-        计算B样条曲线
+        使用Cox-de Boor递推公式计算B样条曲线（逐点逐基函数递归求值）
+        保留作为 b_spline_curve 的参考实现
         :param control_points: 控制点列表
         :param degree: B样条次数（2=二次，3=三次）
         :param num_samples: 采样点数量
@@ -245,21 +671,273 @@ class CurveAlgorithms:
         return curve_points
     
     @staticmethod
-    def quadratic_bezier(p0, p1, p2, num_samples=50):
+    def insert_knot(control_points, degree, knots, t, times=1):
+        """
+        Boehm节点插入：在参数t处插入节点，曲线形状不变
+        :param control_points: 控制点坐标列表 [(x, y), ...]
+        :param degree: B样条次数
+        :param knots: 节点向量
+        :param t: 插入的节点值
+        :param times: 插入次数
+        :return: (新控制点列表, 新节点向量)
+        """
+        points = list(control_points)
+        knots = list(knots)
+        for _ in range(times):
+            span = bisect_right(knots, t) - 1
+            multiplicity = knots.count(t)
+            new_points = points[:span - degree + 1]
+            for i in range(span - degree + 1, span - multiplicity + 1):
+                alpha = (t - knots[i]) / (knots[i + degree] - knots[i])
+                new_points.append((alpha * points[i][0] + (1 - alpha) * points[i - 1][0],
+                                   alpha * points[i][1] + (1 - alpha) * points[i - 1][1]))
+            new_points.extend(points[span - multiplicity:])
+            points = new_points
+            knots.insert(span + 1, t)
+        return points, knots
+    
+    @staticmethod
+    def b_spline_to_bezier(control_points, degree=3, knot_type='clamped'):
+        """
+        Bézier提取：把定义域内每个节点插入到重数为degree，
+        使B样条分解为首尾相接的分段Bézier曲线
+        :param control_points: 控制点列表 [QPoint, ...]
+        :param degree: B样条次数
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 分段Bézier控制点列表 [[(x, y), ...], ...]，每段degree+1个点
+        """
+        n = len(control_points)
+        if n < degree + 1:
+            return []
+        
+        knots = CurveAlgorithms.generate_knots(n, degree, knot_type)
+        points = [(p.x(), p.y()) for p in control_points]
+        return [CurveAlgorithms.b_spline_segment_to_bezier(points, degree, knots, span)
+                for span in CurveAlgorithms.b_spline_segment_spans(n, degree, knots)]
+    
+    @staticmethod
+    def b_spline_segment_spans(n, degree, knots):
+        """
+        列出定义域内的全部非空节点区间，每个区间对应一段Bézier曲线
+        :param n: 控制点数量
+        :param degree: B样条次数
+        :param knots: 节点向量
+        :return: 区间索引列表
+        """
+        return [span for span in range(degree, n) if knots[span] < knots[span + 1]]
+    
+    @staticmethod
+    def b_spline_segment_to_bezier(control_points, degree, knots, span):
+        """
+        提取单个节点区间 [knots[span], knots[span+1]) 上的Bézier控制点
+        只取该区间的degree+1个控制点及局部节点向量，把区间两端节点插入到重数为degree，
+        因此移动一个控制点后只需重新提取受影响的degree+1段
+        :param control_points: 控制点坐标列表 [(x, y), ...]
+        :param degree: B样条次数
+        :param knots: 节点向量
+        :param span: 非空节点区间索引
+        :return: degree+1个Bézier控制点坐标 [(x, y), ...]
+        """
+        points = control_points[span - degree:span + 1]
+        local_knots = knots[span - degree:span + degree + 2]
+        for t in (knots[span], knots[span + 1]):
+            missing = degree - local_knots.count(t)
+            if missing > 0:
+                points, local_knots = CurveAlgorithms.insert_knot(points, degree, local_knots, t, missing)
+        
+        start = bisect_right(local_knots, knots[span]) - 1
+        return points[start - degree:start + 1]
+    
+    @staticmethod
+    def flatten_bezier_segments(segments, tolerance=0.5, scale=1.0, as_array=False):
+        """
+        按屏幕空间容差自适应展平首尾相接的分段Bézier曲线
+        :param segments: 分段Bézier控制点 [[(x, y), ...], ...] 或形状为 (K, degree+1, 2) 的数组
+        :param tolerance: 屏幕空间容差（像素）
+        :param scale: 当前视图缩放因子
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        if len(segments) == 0:
+            return CurveAlgorithms.format_points(np.empty((0, 2)), as_array)
+        
+        coords = [tuple(segments[0][0])]
+        for segment in segments:
+            coords.extend(CurveAlgorithms.flatten_bezier_coords(
+                [tuple(point) for point in segment], tolerance / scale)[1:])
+        return CurveAlgorithms.format_points(np.array(coords, dtype=float), as_array)
+    
+    @staticmethod
+    def sample_bezier_segments(segments, samples_per_segment):
+        """
+        对首尾相接的分段Bézier曲线做均匀采样，所有段一次批量计算
+        :param segments: 分段Bézier控制点数组，形状 (K, degree+1, 2)
+        :param samples_per_segment: 每段的采样区间数
+        :return: 曲线点数组，形状 (K * samples_per_segment + 1, 2)
+        """
+        if len(segments) == 0:
+            return np.empty((0, 2))
+        curves = CurveAlgorithms.bezier_curves_batch(segments, samples_per_segment)
+        # 相邻段共享端点，只保留一份
+        return np.concatenate([curves[:, :-1].reshape(-1, 2), curves[-1, -1:]])
+    
+    @staticmethod
+    def flatten_b_spline_adaptive(control_points, degree=3, tolerance=0.5, scale=1.0,
+                                  knot_type='clamped', as_array=False):
+        """
+        按屏幕空间容差自适应展平B样条曲线
+        先通过节点插入得到分段Bézier形式，再逐段自适应细分
+        :param control_points: 控制点列表 [QPoint, ...]
+        :param degree: B样条次数
+        :param tolerance: 屏幕空间容差（像素）
+        :param scale: 当前视图缩放因子
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :param as_array: 是否返回浮点坐标数组
+        :return: 曲线上的点列表（as_array为True时为 (N, 2) 数组）
+        """
+        segments = CurveAlgorithms.b_spline_to_bezier(control_points, degree, knot_type)
+        return CurveAlgorithms.flatten_bezier_segments(segments, tolerance, scale, as_array)
+    
+    @staticmethod
+    def arc_length_table(points):
+        """
+        计算折线的累积弧长表
+        :param points: 折线顶点数组，形状 (N, 2)
+        :return: 形状 (N,) 的数组，第i项为从起点到第i个顶点的弧长
+        """
+        if len(points) == 0:
+            return np.empty(0)
+        steps = np.hypot(*np.diff(points, axis=0).T)
+        return np.concatenate([[0.0], np.cumsum(steps)])
+    
+    @staticmethod
+    def points_at_distances(points, lengths, distances):
+        """
+        按弧长查询折线上的点：二分查找所在线段后线性插值
+        :param points: 折线顶点数组，形状 (N, 2)
+        :param lengths: 对应的累积弧长表（arc_length_table的结果）
+        :param distances: 弧长值数组，超出范围时截断到两端
+        :return: 形状 (M, 2) 的坐标数组
+        """
+        distances = np.atleast_1d(np.asarray(distances, dtype=float))
+        if len(points) < 2:
+            return np.repeat(points[:1], len(distances), axis=0)
+        
+        distances = np.clip(distances, 0.0, lengths[-1])
+        index = np.clip(np.searchsorted(lengths, distances, side='right') - 1, 0, len(points) - 2)
+        segment = lengths[index + 1] - lengths[index]
+        ratio = np.divide(distances - lengths[index], segment,
+                          out=np.zeros_like(distances), where=segment > 0)
+        return points[index] + ratio[:, None] * (points[index + 1] - points[index])
+    
+    @staticmethod
+    def point_at_distance(points, lengths, distance):
+        """
+        查询弧长为distance处的点，O(log n)
+        :param points: 折线顶点数组，形状 (N, 2)
+        :param lengths: 对应的累积弧长表
+        :param distance: 弧长值
+        :return: 坐标 (x, y)；折线为空时返回None
+        """
+        if len(points) == 0:
+            return None
+        x, y = CurveAlgorithms.points_at_distances(points, lengths, [distance])[0]
+        return float(x), float(y)
+    
+    @staticmethod
+    def build_segment_bvh(points, leaf_size=8):
+        """
+        为折线的线段建立包围盒层次结构（BVH）
+        折线上相邻的线段在空间上也相邻，按线段序号二分即可得到紧凑的包围盒
+        :param points: 折线顶点数组，形状 (N, 2)
+        :param leaf_size: 叶节点包含的最多线段数
+        :return: 节点列表，根节点在索引0；每个节点为
+                 (min_x, min_y, max_x, max_y, start, stop, left, right)，
+                 覆盖线段 start..stop-1，叶节点的 left/right 为 -1
+        """
+        nodes = []
+        
+        def build(start, stop):
+            block = points[start:stop + 1]
+            min_x, min_y = block.min(axis=0).tolist()
+            max_x, max_y = block.max(axis=0).tolist()
+            index = len(nodes)
+            nodes.append(None)
+            if stop - start <= leaf_size:
+                nodes[index] = (min_x, min_y, max_x, max_y, start, stop, -1, -1)
+            else:
+                mid = (start + stop) // 2
+                left = build(start, mid)
+                right = build(mid, stop)
+                nodes[index] = (min_x, min_y, max_x, max_y, start, stop, left, right)
+            return index
+        
+        if len(points) >= 2:
+            build(0, len(points) - 1)
+        return nodes
+    
+    @staticmethod
+    def polyline_distance(points, x, y):
+        """
+        计算点 (x, y) 到折线的最短距离
+        :param points: 折线顶点数组，形状 (N, 2)，N >= 2
+        :return: 最短距离
+        """
+        start = points[:-1]
+        direction = points[1:] - start
+        length2 = np.einsum('ij,ij->i', direction, direction)
+        offset = np.array([x, y]) - start
+        t = np.divide(np.einsum('ij,ij->i', offset, direction), length2,
+                      out=np.zeros_like(length2), where=length2 > 0)
+        closest = start + np.clip(t, 0.0, 1.0)[:, None] * direction
+        return float(np.hypot(closest[:, 0] - x, closest[:, 1] - y).min())
+    
+    @staticmethod
+    def is_point_near_polyline(points, bvh, x, y, tolerance):
+        """
+        借助线段包围盒层次结构判断点是否在折线附近
+        包围盒（外扩tolerance）不含该点的子树整体跳过，只检查少数叶节点
+        :param points: 折线顶点数组，形状 (N, 2)
+        :param bvh: build_segment_bvh 的结果
+        :param x, y: 查询点坐标
+        :param tolerance: 距离容差
+        :return: 点到折线的距离是否不超过tolerance
+        """
+        if not bvh:
+            return False
+        
+        stack = [0]
+        while stack:
+            min_x, min_y, max_x, max_y, start, stop, left, right = bvh[stack.pop()]
+            if (x < min_x - tolerance or x > max_x + tolerance or
+                    y < min_y - tolerance or y > max_y + tolerance):
+                continue
+            if left < 0:
+                if CurveAlgorithms.polyline_distance(points[start:stop + 1], x, y) <= tolerance:
+                    return True
+            else:
+                stack.append(right)
+                stack.append(left)
+        return False
+    
+    @staticmethod
+    def quadratic_bezier(p0, p1, p2, num_samples=50, as_array=False):
         """
         二次Bézier曲线（3个控制点）
         :param p0, p1, p2: 控制点
         :param num_samples: 采样点数量
+        :param as_array: 是否返回浮点坐标数组
         :return: 曲线上的点列表
         """
-        return CurveAlgorithms.bezier_curve_bernstein([p0, p1, p2], num_samples)
+        return CurveAlgorithms.bezier_forward_difference([p0, p1, p2], num_samples, as_array)
     
     @staticmethod
-    def cubic_bezier(p0, p1, p2, p3, num_samples=50):
+    def cubic_bezier(p0, p1, p2, p3, num_samples=50, as_array=False):
         """
         三次Bézier曲线（4个控制点）
         :param p0, p1, p2, p3: 控制点
         :param num_samples: 采样点数量
+        :param as_array: 是否返回浮点坐标数组
         :return: 曲线上的点列表
         """
-        return CurveAlgorithms.bezier_curve_bernstein([p0, p1, p2, p3], num_samples)
+        return CurveAlgorithms.bezier_forward_difference([p0, p1, p2, p3], num_samples, as_array)
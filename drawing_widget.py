@@ -1,9 +1,11 @@
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPolygon, QPixmap, QImage
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPolygon, QPolygonF, QPixmap, QImage
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRectF, QTimer
 from shape_utils import ShapeUtils
+from shape_cache import ShapeCache
 from curve_algorithms import CurveAlgorithms
 from surface_algorithms import SurfaceAlgorithms
+from spatial_index import SpatialIndex
 
 class DrawingWidget(QWidget):
     def __init__(self):
@@ -37,13 +39,29 @@ class DrawingWidget(QWidget):
         self.curve_control_points = []  # 曲线控制点
         self.is_drawing_curve = False
         self.curve_type = 'bezier'  # 'bezier' 或 'bspline'
-        self.curve_algorithm = 'bernstein'  # 'bernstein' 或 'de_casteljau'
+        self.curve_algorithm = 'bernstein'  # 'bernstein'、'de_casteljau' 或 'forward_difference'
+        self.curve_sampling = 'fixed'  # 'fixed'（固定采样数）或 'adaptive'（自适应展平）
+        self.curve_tolerance = 0.5  # 自适应展平的屏幕空间容差（像素）
         
         # 曲面控制网格
         self.surface_control_grid = []  # 二维控制点数组
         self.is_drawing_surface = False
         self.surface_type = 'bezier'  # 'bezier' 或 'triangular'
         self.surface_display_mode = 'wireframe'  # 'wireframe' 或 'filled'
+        self.surface_sampling = 'fixed'  # 'fixed'（固定20×20采样）或 'adaptive'（按平坦度自适应细分）
+        self.surface_tolerance = 0.5  # 自适应细分的屏幕空间容差（像素）
+        
+        # 曲面交互细节层次（LOD）：拖拽曲面或其控制点时正在编辑的曲面改用粗网格，
+        # 拖拽中停顿后按等级逐步细化，拖拽结束时回到静态图层并恢复完整质量
+        self.surface_lod_enabled = True
+        self.surface_lod_levels = [6, 12]  # 各等级每方向的采样数，由粗到细
+        self.surface_lod_idle_ms = 150  # 拖拽中停顿多久后开始细化（毫秒）
+        self.surface_lod_step_ms = 40  # 相邻细化等级之间的间隔（毫秒）
+        self.surface_lod_level = None  # 当前等级下标，None 表示完整质量
+        self.surface_lod_shape = None  # 使用粗网格的曲面（正在拖拽的图形）
+        self.surface_lod_timer = QTimer(self)
+        self.surface_lod_timer.setSingleShot(True)
+        self.surface_lod_timer.timeout.connect(self.refine_surface_lod)
         
         # 控制点拖拽
         self.dragging_control_point = None  # {'shape_index': int, 'point_index': int}
@@ -58,16 +76,40 @@ class DrawingWidget(QWidget):
         
         # 变换操作
         self.transform_mode = None
+        
+        # 静态图层：除正在编辑的图形外，所有已保存图形预先绘制到一张位图上，
+        # 预览与拖拽时每帧只贴图并重画正在编辑的图形
+        self.static_layer = None  # QPixmap
+        self.static_layer_key = None  # 图层对应的图形列表、缩放、尺寸等状态
+        
+        # 视口裁剪统计：累计绘制与因完全不可见而跳过的图形数，用于性能分析
+        self.cull_stats = {'drawn': 0, 'culled': 0}
+        
+        # 图形空间索引：以图形下标登记其重绘范围，用于选择与视口裁剪；
+        # 新增的图形在查询前补登记，移动、变换时由修改方调用 update_shape_index
+        self.shape_index = SpatialIndex(64.0)
+        self.shape_index_shapes = []  # 已登记的图形，按下标与图形列表比较以发现删除、替换
 
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.fillRect(self.rect(), Qt.white)
+        # 只重绘脏区域
+        dirty = event.rect()
+        painter.setClipRect(dirty)
+        # 1. 贴上脏区域内的静态图层（含白色背景），正在编辑的图形画在图层之上
+        active_index = self.active_shape_index()
+        layer = self.static_layer_pixmap(active_index)
+        ratio = layer.devicePixelRatioF()
+        painter.drawPixmap(QRectF(dirty), layer, QRectF(dirty.x() * ratio, dirty.y() * ratio,
+                                                       dirty.width() * ratio, dirty.height() * ratio))
         # 应用缩放
         painter.scale(self.scale_factor, self.scale_factor)
-        
-        # 1. 绘制所有已保存的图形
-        for shape in self.shapes:
-            self.draw_shape(painter, shape)
+        if active_index >= 0:
+            shape = self.shapes[active_index]
+            if self.shape_dirty_rect(shape).intersects(self._to_scene_rect(dirty)):
+                self.draw_shape(painter, shape)
+                self.cull_stats['drawn'] += 1
+            else:
+                self.cull_stats['culled'] += 1
 
         # 2. 绘制临时预览
         if self.current_tool == 'polygon' and self.is_drawing_polygon:
@@ -88,17 +130,116 @@ class DrawingWidget(QWidget):
             status_text += f" (已添加{len(self.curve_control_points)}个控制点，双击完成)"
         painter.drawText(10, 30, status_text + f" | 缩放: {self.scale_factor:.2f}x")
 
+    def active_shape_index(self):
+        """正在拖动或拖拽控制点的图形索引；没有时返回-1"""
+        if self.dragging_control_point:
+            return self.dragging_control_point['shape_index']
+        if self.is_dragging:
+            return self.selected_shape_index
+        return -1
+    
+    def static_layer_pixmap(self, active_index):
+        """
+        获取静态图层：除active_index外的所有图形按当前缩放绘制在白色背景上
+        图形列表、选中图形、缩放或部件尺寸变化时重新绘制；图层中的曲面总是完整质量，
+        细节层次变化不影响图层，
+        其余修改图形的操作需调用 invalidate_static_layer
+        :param active_index: 正在编辑、不放入图层的图形索引（-1表示没有）
+        :return: QPixmap
+        """
+        key = (id(self.shapes), len(self.shapes), active_index, self.selected_shape_index,
+               self.scale_factor, self.width(), self.height())
+        if self.static_layer is None or self.static_layer_key != key:
+            ratio = self.devicePixelRatioF()
+            layer = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+            layer.setDevicePixelRatio(ratio)
+            layer.fill(Qt.white)
+            # 视口裁剪：边界完全在可见场景范围之外的图形不做采样和绘制
+            self.sync_shape_index()
+            view = self._to_scene_rect(self.rect())
+            visible = [self.shapes[i] for i in sorted(self.shape_index.query_rect(self._rect_tuple(view)))
+                       if i != active_index]
+            self.cull_stats['drawn'] += len(visible)
+            self.cull_stats['culled'] += len(self.shapes) - len(visible) - (active_index >= 0)
+            
+            painter = QPainter(layer)
+            painter.scale(self.scale_factor, self.scale_factor)
+            # 曲线先按组批量计算采样点
+            ShapeCache.evaluate_curves_batch(visible, 100)
+            for shape in visible:
+                self.draw_shape(painter, shape)
+            painter.end()
+            self.static_layer = layer
+            self.static_layer_key = key
+        return self.static_layer
+    
+    def shape_dirty_rect(self, shape):
+        """
+        图形在场景坐标下可能绘制到的范围：边界外扩选中时的线宽与控制点半径
+        :return: QRectF
+        """
+        margin = shape.get('line_width', 1) + 2 + self.control_point_radius
+        return QRectF(ShapeCache.shape_bounds(shape)).adjusted(-margin, -margin, margin, margin)
+    
+    def update_scene_rects(self, *rects):
+        """
+        只重绘场景坐标下若干矩形的并集
+        :param rects: QRectF，None 表示该部分没有内容
+        """
+        dirty = QRectF()
+        for rect in rects:
+            if rect is not None:
+                dirty = dirty.united(rect)
+        if dirty.isNull():
+            return
+        s = self.scale_factor
+        device_rect = QRectF(dirty.x() * s, dirty.y() * s, dirty.width() * s, dirty.height() * s)
+        self.update(device_rect.toAlignedRect().adjusted(-1, -1, 1, 1))
+    
+    @staticmethod
+    def _rect_tuple(rect):
+        """QRectF 转换为空间索引使用的 (x0, y0, x1, y1)"""
+        return (rect.left(), rect.top(), rect.right(), rect.bottom())
+    
+    def sync_shape_index(self):
+        """
+        使图形空间索引与图形列表一致：列表末尾新增的图形逐个登记，
+        图形被删除或列表被替换时整体重建。删除任何图形都会使其后的图形下标前移，
+        因此只需比较已登记的首末两个图形是否仍在原来的下标上
+        """
+        registered = self.shape_index_shapes
+        if registered and (len(registered) > len(self.shapes) or registered[0] is not self.shapes[0]
+                           or registered[-1] is not self.shapes[len(registered) - 1]):
+            self.shape_index.clear()
+            registered.clear()
+        for i in range(len(registered), len(self.shapes)):
+            self.shape_index.insert(i, self._rect_tuple(self.shape_dirty_rect(self.shapes[i])))
+            registered.append(self.shapes[i])
+    
+    def update_shape_index(self, shape_index):
+        """图形移动或变换后更新其在空间索引中的范围"""
+        shape = self.shapes[shape_index]
+        if shape_index < len(self.shape_index_shapes) and self.shape_index_shapes[shape_index] is shape:
+            self.shape_index.update(shape_index, self._rect_tuple(self.shape_dirty_rect(shape)))
+    
+    def reset_cull_stats(self):
+        """清零视口裁剪统计"""
+        self.cull_stats['drawn'] = 0
+        self.cull_stats['culled'] = 0
+    
+    def invalidate_static_layer(self):
+        """图形属性或几何在拖拽之外被修改后调用，下次重绘时重新绘制静态图层"""
+        self.static_layer = None
+    
     def draw_shape(self, painter, shape):
         # 保存 painter 的当前状态
         painter.save()
         
         try:
             # 如果是选中的图形，用不同的颜色或样式
-            try:
-                is_selected = (self.shapes.index(shape) == self.selected_shape_index)
-            except ValueError:
-                # 临时预览图形不在 self.shapes 中
-                is_selected = False
+            # （按对象身份比较，临时预览图形不在 self.shapes 中）
+            is_selected = (0 <= self.selected_shape_index < len(self.shapes)
+                           and self.shapes[self.selected_shape_index] is shape)
             
             if is_selected:
                 # 选中状态：红色边框，稍粗的线
@@ -133,8 +274,10 @@ class DrawingWidget(QWidget):
                 painter.drawPolygon(polygon)
             elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
                 self.draw_curve(painter, shape, is_selected)
-            elif shape['tool'] in ['bezier_surface']:
+            elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
                 self.draw_surface(painter, shape, is_selected)
+            elif shape['tool'] == 'triangular_surface':
+                self.draw_triangular_surface(painter, shape, is_selected)
                 
         finally:
             # 恢复 painter 的原始状态
@@ -157,8 +300,7 @@ class DrawingWidget(QWidget):
         
         # 绘制已确定的边
         if len(self.polygon_points) > 1:
-            for i in range(len(self.polygon_points) - 1):
-                painter.drawLine(self.polygon_points[i], self.polygon_points[i + 1])
+            painter.drawPolyline(QPolygon(self.polygon_points))
         
         # 绘制顶点小圆点
         solid_pen = QPen(self.current_color, 1)
@@ -184,24 +326,35 @@ class DrawingWidget(QWidget):
         # 绘制控制多边形（虚线）
         pen = QPen(QColor(150, 150, 150), 1, Qt.DashLine)
         painter.setPen(pen)
-        for i in range(len(self.curve_control_points) - 1):
-            painter.drawLine(self.curve_control_points[i], self.curve_control_points[i + 1])
+        painter.drawPolyline(QPolygon(self.curve_control_points))
         
         # 如果有足够的控制点，绘制曲线预览
         if len(self.curve_control_points) >= 2:
             pen = QPen(self.current_color, self.current_line_width, Qt.DashLine)
             painter.setPen(pen)
             
+            adaptive = self.curve_sampling == 'adaptive'
+            curve_points = None
             if self.curve_type == 'bezier':
-                curve_points = CurveAlgorithms.bezier_curve_bernstein(self.curve_control_points, 50)
+                if adaptive:
+                    curve_points = CurveAlgorithms.flatten_bezier_adaptive(
+                        self.curve_control_points, self.curve_tolerance, self.scale_factor,
+                        as_array=True)
+                else:
+                    curve_points = CurveAlgorithms.bezier_curve_matrix(
+                        self.curve_control_points, 50, as_array=True)
             else:  # bspline
                 if len(self.curve_control_points) >= 4:
-                    curve_points = CurveAlgorithms.b_spline_curve(self.curve_control_points, 3, 50)
-                else:
-                    curve_points = []
+                    if adaptive:
+                        curve_points = CurveAlgorithms.flatten_b_spline_adaptive(
+                            self.curve_control_points, 3, self.curve_tolerance, self.scale_factor,
+                            as_array=True)
+                    else:
+                        curve_points = CurveAlgorithms.b_spline_curve(
+                            self.curve_control_points, 3, 50, as_array=True)
             
-            for i in range(len(curve_points) - 1):
-                painter.drawLine(curve_points[i], curve_points[i + 1])
+            if curve_points is not None and len(curve_points) > 1:
+                painter.drawPolyline(ShapeUtils.to_polygonf(curve_points))
         
         # 绘制控制点
         painter.setBrush(QBrush(QColor(0, 128, 255)))
@@ -303,14 +456,24 @@ class DrawingWidget(QWidget):
             # 拖动模式：实时更新图形位置
             self.drag_shape_to(scene_pos)
         elif self.current_tool in ["bezier_curve", "bspline_curve"] and self.is_drawing_curve:
+            # 曲线预览只画已确定的控制点，不随鼠标位置变化，无需重绘
             self.temp_end_point = scene_pos
-            self.update()
         elif self.current_tool == "polygon" and self.is_drawing_polygon:
+            # 多边形预览只画已确定的顶点，不随鼠标位置变化，无需重绘
             self.temp_end_point = scene_pos
-            self.update()
         elif self.start_point:
+            # 只重绘新旧预览范围
+            old_rect = self.temp_shape_dirty_rect()
             self.temp_end_point = scene_pos
-            self.update()
+            self.update_scene_rects(old_rect, self.temp_shape_dirty_rect())
+
+    def temp_shape_dirty_rect(self):
+        """当前预览图形在场景坐标下的重绘范围；没有预览时返回None"""
+        if not (self.start_point and self.temp_end_point):
+            return None
+        margin = self.current_line_width + 2
+        rect = QRectF(self._get_rect(self.start_point, self.temp_end_point))
+        return rect.adjusted(-margin, -margin, margin, margin)
 
     def mouseDoubleClickEvent(self, event):
         """双击完成多边形或曲线"""
@@ -361,6 +524,11 @@ class DrawingWidget(QWidget):
             return device_pos
         return QPoint(int(device_pos.x() / self.scale_factor), int(device_pos.y() / self.scale_factor))
 
+    def _to_scene_rect(self, device_rect):
+        """将窗口坐标矩形转换为场景坐标（考虑缩放），返回QRectF"""
+        s = self.scale_factor
+        return QRectF(device_rect.x() / s, device_rect.y() / s, device_rect.width() / s, device_rect.height() / s)
+
     def _get_rect(self, start, end):
         """根据起点终点计算矩形区域，返回QRect对象"""
         from PyQt5.QtCore import QRect
@@ -375,8 +543,9 @@ class DrawingWidget(QWidget):
         # 先取消当前选择
         self.selected_shape_index = -1
         
-        # 从后往前检查（后绘制的图形在上层）
-        for i in range(len(self.shapes) - 1, -1, -1):
+        # 空间索引给出范围包含该点的候选图形，从后往前检查（后绘制的图形在上层）
+        self.sync_shape_index()
+        for i in sorted(self.shape_index.query_point(point.x(), point.y()), reverse=True):
             shape = self.shapes[i]
             if ShapeUtils.is_point_in_shape(point, shape):
                 self.selected_shape_index = i
@@ -409,8 +578,14 @@ class DrawingWidget(QWidget):
         
         # 计算新的中心位置
         new_center = pos - self.drag_offset
+        shape = self.shapes[self.selected_shape_index]
+        old_rect = self.shape_dirty_rect(shape)
         self.update_shape_position(self.selected_shape_index, new_center)
-        self.update()
+        self.update_shape_index(self.selected_shape_index)
+        if shape['tool'] in ['bezier_surface', 'bspline_surface', 'triangular_surface']:
+            self.begin_surface_interaction(shape)
+        # 只重绘图形移动前后的范围
+        self.update_scene_rects(old_rect, self.shape_dirty_rect(shape))
 
     def update_shape_position(self, shape_index, new_center):
         """更新图形位置到新的中心点"""
@@ -429,6 +604,7 @@ class DrawingWidget(QWidget):
             shape['points'] = [
                 point + delta for point in self.original_shape_data['points']
             ]
+        ShapeCache.bump_version(shape)
 
     
 
@@ -455,9 +631,36 @@ class DrawingWidget(QWidget):
                 'line_width': shape['line_width'],
                 'fill_color': shape.get('fill_color'),
                 'algorithm': shape.get('algorithm', 'bernstein'),
+                'sampling': shape.get('sampling', 'fixed'),
                 'degree': shape.get('degree', 3),
                 'show_control_points': shape.get('show_control_points', True)
             }
+        elif shape['tool'] == 'triangular_surface':
+            # 三边曲面需要复制控制点
+            return {
+                'tool': shape['tool'],
+                'control_points': [QPoint(p.x(), p.y()) for p in shape.get('control_points', [])],
+                'degree': shape.get('degree', 3),
+                'color': shape['color'],
+                'line_width': shape['line_width'],
+                'fill_color': shape.get('fill_color'),
+                'display_mode': shape.get('display_mode', 'wireframe'),
+                'show_control_grid': shape.get('show_control_grid', True)
+            }
+        elif shape['tool'] == 'bspline_surface':
+            # B样条曲面需要复制控制网格
+            return {
+                'tool': shape['tool'],
+                'control_grid': [[QPoint(p.x(), p.y()) for p in row] for row in shape.get('control_grid', [])],
+                'heights': [row[:] for row in shape.get('heights', [])],
+                'degree': shape.get('degree', 3),
+                'knot_type': shape.get('knot_type', 'clamped'),
+                'color': shape['color'],
+                'line_width': shape['line_width'],
+                'fill_color': shape.get('fill_color'),
+                'display_mode': shape.get('display_mode', 'wireframe'),
+                'show_control_grid': shape.get('show_control_grid', True)
+            }
         elif shape['tool'] == 'bezier_surface':
             # 曲面需要复制控制网格
             control_grid_copy = []
@@ -466,10 +669,12 @@ class DrawingWidget(QWidget):
             return {
                 'tool': shape['tool'],
                 'control_grid': control_grid_copy,
+                'heights': [row[:] for row in shape.get('heights', [])],
                 'color': shape['color'],
                 'line_width': shape['line_width'],
                 'fill_color': shape.get('fill_color'),
                 'display_mode': shape.get('display_mode', 'wireframe'),
+                'sampling': shape.get('sampling', 'fixed'),
                 'show_control_grid': shape.get('show_control_grid', True)
             }
         else:
@@ -489,6 +694,10 @@ class DrawingWidget(QWidget):
         self.drag_start_point = None
         self.drag_offset = QPoint(0, 0)
         self.original_shape_data = None
+        self.end_surface_interaction()
+        # 图形回到静态图层中原来的绘制次序
+        if 0 <= self.selected_shape_index < len(self.shapes):
+            self.update_scene_rects(self.shape_dirty_rect(self.shapes[self.selected_shape_index]))
         print("拖动结束")
     
     def get_shape_center(self, shape):
@@ -525,15 +734,25 @@ class DrawingWidget(QWidget):
             self.handle_surface_setup()
             # 切换回选择工具以便编辑
             self.current_tool = "select"
+        elif tool_id == "bspline_surface":
+            self.handle_b_spline_surface_setup()
+            self.current_tool = "select"
+        elif tool_id == "triangular_surface":
+            self.handle_triangular_surface_setup()
+            self.current_tool = "select"
         
         self.update()
 
     # ===== 缩放相关 =====
     def wheelEvent(self, event):
-        """滚轮缩放（以窗口左上角为原点进行缩放）"""
+        """滚轮缩放（以窗口左上角为原点进行缩放）；按住Shift时调整曲面控制点高度"""
         delta = event.angleDelta().y()
         if delta == 0:
             return
+        if event.modifiers() & Qt.ShiftModifier:
+            scene_pos = self._to_scene_point(event.position().toPoint())
+            if self.adjust_control_point_height(scene_pos, 10.0 if delta > 0 else -10.0):
+                return
         scale_step = 1.1 if delta > 0 else 1/1.1
         new_scale = max(self.min_scale, min(self.max_scale, self.scale_factor * scale_step))
         if abs(new_scale - self.scale_factor) > 1e-6:
@@ -572,26 +791,12 @@ class DrawingWidget(QWidget):
         if len(control_points) < 2:
             return
         
-        # 计算曲线点
-        curve_points = []
-        if shape['tool'] == 'bezier_curve':
-            algorithm = shape.get('algorithm', 'bernstein')
-            if algorithm == 'de_casteljau':
-                curve_points = CurveAlgorithms.bezier_curve_de_casteljau(control_points, 100)
-            else:
-                curve_points = CurveAlgorithms.bezier_curve_bernstein(control_points, 100)
-        elif shape['tool'] == 'bspline_curve':
-            degree = shape.get('degree', 3)
-            # B样条曲线需要至少 degree+1 个控制点
-            if len(control_points) >= degree + 1:
-                curve_points = CurveAlgorithms.b_spline_curve(control_points, degree, 100)
-            else:
-                curve_points = []
+        # 计算曲线点（浮点坐标数组，以几何版本为键缓存在图形上）
+        curve_points = ShapeCache.curve_display_points(shape, self.curve_tolerance, self.scale_factor)
         
-        # 绘制曲线
-        if len(curve_points) > 1:
-            for i in range(len(curve_points) - 1):
-                painter.drawLine(curve_points[i], curve_points[i + 1])
+        # 绘制曲线：整条折线一次绘制
+        if curve_points is not None and len(curve_points) > 1:
+            painter.drawPolyline(ShapeUtils.to_polygonf(curve_points))
         
         # 绘制控制点和控制多边形
         if is_selected or shape.get('show_control_points', False):
@@ -599,8 +804,7 @@ class DrawingWidget(QWidget):
             old_pen = painter.pen()
             pen = QPen(QColor(150, 150, 150), 1, Qt.DashLine)
             painter.setPen(pen)
-            for i in range(len(control_points) - 1):
-                painter.drawLine(control_points[i], control_points[i + 1])
+            painter.drawPolyline(QPolygon(control_points))
             painter.setPen(old_pen)
             
             # 绘制控制点
@@ -621,9 +825,27 @@ class DrawingWidget(QWidget):
         
         display_mode = shape.get('display_mode', 'wireframe')
         
-        if shape['tool'] == 'bezier_surface':
-            # 计算曲面
-            surface_data = SurfaceAlgorithms.bezier_surface(control_grid, 20, 20)
+        if shape['tool'] in ['bezier_surface', 'bspline_surface']:
+            # 计算曲面（采样网格缓存在图形上，固定采样时拖拽控制点增量更新）
+            lod_samples = self.surface_lod_samples(shape)
+            if shape['tool'] == 'bspline_surface':
+                # B样条曲面：拖拽控制点时只更新其局部支撑区域
+                samples = lod_samples or 30
+                points_grid = ShapeCache.b_spline_surface_samples(shape, samples, samples)
+            elif lod_samples is not None:
+                # 交互中使用粗网格
+                points_grid = ShapeCache.bezier_surface_samples(shape, lod_samples, lod_samples)
+            elif shape.get('sampling', 'fixed') == 'adaptive':
+                # 按当前缩放自适应细分
+                points_grid = ShapeCache.bezier_surface_adaptive(
+                    shape, self.surface_tolerance, self.scale_factor)
+            else:
+                points_grid = ShapeCache.bezier_surface_samples(shape, 20, 20)
+            surface_data = {
+                'points': points_grid,
+                'u_lines': points_grid,
+                'v_lines': points_grid.transpose(1, 0, 2)
+            }
             
             if display_mode == 'wireframe':
                 # 绘制网格线
@@ -633,40 +855,26 @@ class DrawingWidget(QWidget):
                 
                 # u方向的线
                 for line in surface_data['u_lines']:
-                    for i in range(len(line) - 1):
-                        painter.drawLine(line[i], line[i + 1])
+                    painter.drawPolyline(ShapeUtils.to_polygonf(line))
                 
                 # v方向的线
                 for line in surface_data['v_lines']:
-                    for i in range(len(line) - 1):
-                        painter.drawLine(line[i], line[i + 1])
+                    painter.drawPolyline(ShapeUtils.to_polygonf(line))
                 
                 painter.setPen(old_pen)
             
             elif display_mode == 'filled':
                 # 填充模式
-                points_grid = surface_data['points']
                 fill_color1 = shape.get('fill_color', QColor(200, 200, 255))
                 fill_color2 = QColor(255, 200, 200)
                 
-                # 绘制每个小四边形
-                for i in range(len(points_grid) - 1):
-                    for j in range(len(points_grid[0]) - 1):
-                        p0 = points_grid[i][j]
-                        p1 = points_grid[i + 1][j]
-                        p2 = points_grid[i + 1][j + 1]
-                        p3 = points_grid[i][j + 1]
-                        
-                        # 计算渐变颜色
-                        t = i / (len(points_grid) - 1)
-                        color = SurfaceAlgorithms.interpolate_color(fill_color1, fill_color2, t)
-                        
-                        painter.setBrush(QBrush(color))
-                        painter.setPen(QPen(color, 1))
-                        
-                        # 绘制四边形（拆分成两个三角形）
-                        polygon = QPolygon([p0, p1, p2, p3])
-                        painter.drawPolygon(polygon)
+                # 采样网格三角化后整体光栅化为一张图像（Lambert光照、深度缓冲消隐），
+                # 几何、高度与颜色不变时复用
+                image, (x, y, width, height) = ShapeCache.surface_image(
+                    shape, fill_color1, fill_color2, self.scale_factor)
+                # 图像分辨率与视图缩放不一定相同，缩放时做平滑插值
+                painter.setRenderHint(QPainter.SmoothPixmapTransform)
+                painter.drawImage(QRectF(x, y, width, height), image)
         
         # 绘制控制网格
         if is_selected or shape.get('show_control_grid', False):
@@ -676,12 +884,10 @@ class DrawingWidget(QWidget):
             
             # 绘制控制网格线
             for row in control_grid:
-                for i in range(len(row) - 1):
-                    painter.drawLine(row[i], row[i + 1])
+                painter.drawPolyline(QPolygon(row))
             
             for j in range(len(control_grid[0])):
-                for i in range(len(control_grid) - 1):
-                    painter.drawLine(control_grid[i][j], control_grid[i + 1][j])
+                painter.drawPolyline(QPolygon([row[j] for row in control_grid]))
             
             # 绘制控制点
             for i, row in enumerate(control_grid):
@@ -691,6 +897,49 @@ class DrawingWidget(QWidget):
             
             painter.setPen(old_pen)
     
+    def draw_triangular_surface(self, painter, shape, is_selected=False):
+        """绘制三边Bézier曲面"""
+        control_points = shape.get('control_points', [])
+        degree = shape.get('degree', 3)
+        if len(control_points) != (degree + 1) * (degree + 2) // 2:
+            return
+        
+        samples = self.surface_lod_samples(shape) or 20
+        surface_data = ShapeCache.triangular_surface_samples(shape, samples)
+        display_mode = shape.get('display_mode', 'wireframe')
+        
+        if display_mode == 'wireframe':
+            old_pen = painter.pen()
+            painter.setPen(QPen(shape['color'], shape['line_width']))
+            # 三组等参数线
+            for line in surface_data['lines']:
+                painter.drawPolyline(ShapeUtils.to_polygonf(line))
+            painter.setPen(old_pen)
+        
+        elif display_mode == 'filled':
+            fill_color1 = shape.get('fill_color', QColor(200, 200, 255))
+            fill_color2 = QColor(255, 200, 200)
+            
+            # 三角形网格整体光栅化为一张图像，颜色随u渐变
+            image, (x, y, width, height) = ShapeCache.triangular_surface_image(
+                shape, fill_color1, fill_color2, self.scale_factor, samples)
+            # 图像分辨率与视图缩放不一定相同，缩放时做平滑插值
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(QRectF(x, y, width, height), image)
+        
+        # 绘制控制网：控制点的排列与degree阶重心格点一致
+        if is_selected or shape.get('show_control_grid', False):
+            old_pen = painter.pen()
+            painter.setPen(QPen(QColor(100, 100, 100), 1, Qt.DotLine))
+            _, _, net_lines = SurfaceAlgorithms.triangular_lattice(degree)
+            for line in net_lines:
+                painter.drawPolyline(QPolygon([control_points[i] for i in line]))
+            
+            painter.setBrush(QBrush(QColor(255, 128, 0)))
+            for cp in control_points:
+                painter.drawEllipse(cp, self.control_point_radius, self.control_point_radius)
+            painter.setPen(old_pen)
+    
     def handle_curve_click(self, pos):
         """处理曲线工具的点击"""
         if not self.is_drawing_curve:
@@ -714,6 +963,7 @@ class DrawingWidget(QWidget):
                 "color": self.current_color,
                 "line_width": self.current_line_width,
                 "algorithm": self.curve_algorithm,
+                "sampling": self.curve_sampling,
                 "degree": 3,  # B样条次数
                 "show_control_points": True
             }
@@ -748,47 +998,112 @@ class DrawingWidget(QWidget):
                 row.append(QPoint(x, y))
             self.surface_control_grid.append(row)
         
+        # 控制点高度（垂直于画布，朝向观察者为正），中间四个控制点隆起
+        heights = [[80.0 if 0 < i < rows - 1 and 0 < j < cols - 1 else 0.0 for j in range(cols)]
+                   for i in range(rows)]
+        
         # 创建曲面形状
         surface_shape = {
             "tool": "bezier_surface",
             "control_grid": [row[:] for row in self.surface_control_grid],  # 深拷贝
+            "heights": heights,
             "color": self.current_color,
             "line_width": self.current_line_width,
             "fill_color": self.current_fill_color,
             "display_mode": self.surface_display_mode,
+            "sampling": self.surface_sampling,
             "show_control_grid": True
         }
         self.shapes.append(surface_shape)
         print("Bézier曲面已创建")
         self.update()
     
+    def handle_b_spline_surface_setup(self):
+        """创建B样条曲面（6×6控制网格，双三次，clamped节点）"""
+        rows = 6
+        cols = 6
+        spacing_x = 50
+        spacing_y = 50
+        start_x = 420
+        start_y = 420
+        
+        control_grid = []
+        for i in range(rows):
+            row = []
+            for j in range(cols):
+                row.append(QPoint(start_x + j * spacing_x, start_y + i * spacing_y))
+            control_grid.append(row)
+        
+        # 控制点高度，中间2×2个控制点隆起
+        heights = [[80.0 if 2 <= i <= 3 and 2 <= j <= 3 else 0.0 for j in range(cols)]
+                   for i in range(rows)]
+        
+        surface_shape = {
+            "tool": "bspline_surface",
+            "control_grid": control_grid,
+            "heights": heights,
+            "degree": 3,
+            "knot_type": "clamped",
+            "color": self.current_color,
+            "line_width": self.current_line_width,
+            "fill_color": self.current_fill_color,
+            "display_mode": self.surface_display_mode,
+            "show_control_grid": True
+        }
+        self.shapes.append(surface_shape)
+        print("B样条曲面已创建")
+        self.update()
+    
+    def handle_triangular_surface_setup(self):
+        """创建三边Bézier曲面（三次，控制点均匀分布在三角形上）"""
+        degree = 3
+        corners = [QPoint(460, 380), QPoint(620, 100), QPoint(780, 380)]
+        
+        control_points = []
+        for i, j, k in SurfaceAlgorithms.triangular_multi_indices(degree):
+            x = (i * corners[0].x() + j * corners[1].x() + k * corners[2].x()) / degree
+            y = (i * corners[0].y() + j * corners[1].y() + k * corners[2].y()) / degree
+            control_points.append(QPoint(int(x), int(y)))
+        
+        surface_shape = {
+            "tool": "triangular_surface",
+            "control_points": control_points,
+            "degree": degree,
+            "color": self.current_color,
+            "line_width": self.current_line_width,
+            "fill_color": self.current_fill_color,
+            "display_mode": self.surface_display_mode,
+            "show_control_grid": True
+        }
+        self.shapes.append(surface_shape)
+        print("三边Bézier曲面已创建")
+        self.update()
+    
     def find_control_point_at(self, pos, tolerance=8):
         """查找指定位置的控制点"""
         if self.selected_shape_index < 0 or self.selected_shape_index >= len(self.shapes):
             return None
         
         shape = self.shapes[self.selected_shape_index]
+        if shape['tool'] not in ['bezier_curve', 'bspline_curve', 'bezier_surface', 'bspline_surface',
+                                 'triangular_surface']:
+            return None
         
-        # 检查曲线控制点
-        if shape['tool'] in ['bezier_curve', 'bspline_curve']:
-            control_points = shape.get('control_points', [])
-            for i, cp in enumerate(control_points):
-                dx = pos.x() - cp.x()
-                dy = pos.y() - cp.y()
-                if dx * dx + dy * dy <= tolerance * tolerance:
-                    return {'type': 'curve', 'point_index': i}
-        
-        # 检查曲面控制点
-        elif shape['tool'] == 'bezier_surface':
-            control_grid = shape.get('control_grid', [])
-            for i, row in enumerate(control_grid):
-                for j, cp in enumerate(row):
-                    dx = pos.x() - cp.x()
-                    dy = pos.y() - cp.y()
-                    if dx * dx + dy * dy <= tolerance * tolerance:
-                        return {'type': 'surface', 'row': i, 'col': j}
+        # 控制点均匀网格索引随几何版本缓存，只检查点击位置附近的控制点；
+        # 多个控制点都在容差内时取编号最小的（与按顺序扫描的结果一致）
+        index = ShapeCache.control_point_index(shape)
+        x, y = pos.x(), pos.y()
+        hits = [key for key in index.query_rect((x - tolerance, y - tolerance, x + tolerance, y + tolerance))
+                if (index.rects[key][0] - x) ** 2 + (index.rects[key][1] - y) ** 2 <= tolerance * tolerance]
+        if not hits:
+            return None
+        key = min(hits)
         
-        return None
+        if shape['tool'] in ['bezier_curve', 'bspline_curve']:
+            return {'type': 'curve', 'point_index': key}
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
+            return {'type': 'surface', 'row': key[0], 'col': key[1]}
+        return {'type': 'triangular', 'point_index': key}
     
     def start_control_point_drag(self, pos):
         """开始拖拽控制点"""
@@ -814,27 +1129,119 @@ class DrawingWidget(QWidget):
             return
         
         shape = self.shapes[shape_index]
+        old_rect = self.shape_dirty_rect(shape)
         
         if cp_info['type'] == 'curve':
             point_index = cp_info['point_index']
             if 'control_points' in shape and point_index < len(shape['control_points']):
                 shape['control_points'][point_index] = pos
+                if shape['tool'] == 'bspline_curve':
+                    # 局部支撑：只重算受该控制点影响的曲线段
+                    ShapeCache.update_b_spline_point(shape, point_index)
+                else:
+                    ShapeCache.bump_version(shape)
         
         elif cp_info['type'] == 'surface':
             row = cp_info['row']
             col = cp_info['col']
             if 'control_grid' in shape and row < len(shape['control_grid']) and col < len(shape['control_grid'][row]):
                 shape['control_grid'][row][col] = pos
+                # 秩1增量更新缓存的采样网格
+                ShapeCache.update_surface_point(shape, row, col)
         
-        self.update()
+        elif cp_info['type'] == 'triangular':
+            point_index = cp_info['point_index']
+            if 'control_points' in shape and point_index < len(shape['control_points']):
+                shape['control_points'][point_index] = pos
+                ShapeCache.bump_version(shape)
+        
+        self.update_shape_index(shape_index)
+        if cp_info['type'] in ['surface', 'triangular']:
+            self.begin_surface_interaction(shape)
+        # 曲线、曲面都在控制点凸包内，只重绘控制点移动前后的范围
+        self.update_scene_rects(old_rect, self.shape_dirty_rect(shape))
     
     def end_control_point_drag(self):
         """结束控制点拖拽"""
         if self.dragging_control_point:
             print("结束控制点拖拽")
             self.dragging_control_point = None
+            self.end_surface_interaction()
             self.update()
     
+    def adjust_control_point_height(self, pos, step):
+        """
+        调整选中曲面在pos处控制点的高度
+        :param pos: 场景坐标
+        :param step: 高度增量
+        :return: 是否找到并调整了控制点
+        """
+        if self.selected_shape_index < 0:
+            return False
+        cp_info = self.find_control_point_at(pos)
+        if not cp_info or cp_info['type'] != 'surface':
+            return False
+        
+        shape = self.shapes[self.selected_shape_index]
+        control_grid = shape['control_grid']
+        heights = shape.get('heights')
+        if not heights or len(heights) != len(control_grid) or len(heights[0]) != len(control_grid[0]):
+            heights = [[0.0] * len(row) for row in control_grid]
+            shape['heights'] = heights
+        heights[cp_info['row']][cp_info['col']] += step
+        ShapeCache.bump_version(shape)
+        print(f"控制点高度: {heights[cp_info['row']][cp_info['col']]:.0f}")
+        self.invalidate_static_layer()
+        self.update()
+        return True
+    
+    # ===== 曲面细节层次 =====
+    def begin_surface_interaction(self, shape):
+        """
+        曲面交互进行中：被拖拽的曲面切换到最粗的细节层次，停顿 surface_lod_idle_ms 后开始细化
+        :param shape: 正在拖拽的曲面，其余图形不受影响
+        """
+        if not self.surface_lod_enabled or not self.surface_lod_levels:
+            return
+        changed = self.surface_lod_level != 0 or self.surface_lod_shape is not shape
+        self.surface_lod_shape = shape
+        self.surface_lod_level = 0
+        self.surface_lod_timer.start(self.surface_lod_idle_ms)
+        if changed:
+            self.update_scene_rects(self.shape_dirty_rect(shape))
+    
+    def end_surface_interaction(self):
+        """曲面交互结束：曲面回到静态图层，静态图层总是完整质量，不再需要逐级细化"""
+        self.surface_lod_timer.stop()
+        self.surface_lod_level = None
+        self.surface_lod_shape = None
+    
+    def refine_surface_lod(self):
+        """被拖拽的曲面细化一级，直到恢复完整质量；只重绘该曲面的范围"""
+        shape = self.surface_lod_shape
+        if self.surface_lod_level is None or shape is None:
+            return
+        self.surface_lod_level += 1
+        if self.surface_lod_level >= len(self.surface_lod_levels):
+            self.surface_lod_level = None
+            self.surface_lod_shape = None
+        else:
+            self.surface_lod_timer.start(self.surface_lod_step_ms)
+        self.update_scene_rects(self.shape_dirty_rect(shape))
+    
+    def surface_lod_samples(self, shape):
+        """
+        图形在当前细节层次的每方向采样数
+        只有正在编辑、画在静态图层之上的图形使用粗网格，静态图层中的图形总是完整质量
+        :return: 采样数；完整质量时返回None
+        """
+        if self.surface_lod_level is None or shape is not self.surface_lod_shape:
+            return None
+        active_index = self.active_shape_index()
+        if not 0 <= active_index < len(self.shapes) or self.shapes[active_index] is not shape:
+            return None
+        return self.surface_lod_levels[self.surface_lod_level]
+    
     # ===== 变换操作 =====
     def apply_transform_to_selected(self, transform_type, **params):
         """对选中的图形应用变换"""
@@ -859,6 +1266,8 @@ class DrawingWidget(QWidget):
             center = params.get('center', self.get_shape_center(shape))
             self.scale_shape(shape, sx, sy, center)
         
+        self.update_shape_index(self.selected_shape_index)
+        self.invalidate_static_layer()
         self.update()
     
     def translate_shape(self, shape, dx, dy):
@@ -872,14 +1281,16 @@ class DrawingWidget(QWidget):
         elif shape['tool'] == 'polygon':
             shape['points'] = [p + delta for p in shape['points']]
         
-        elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
+        elif shape['tool'] in ['bezier_curve', 'bspline_curve', 'triangular_surface']:
             shape['control_points'] = [p + delta for p in shape['control_points']]
         
-        elif shape['tool'] == 'bezier_surface':
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
             new_grid = []
             for row in shape['control_grid']:
                 new_grid.append([p + delta for p in row])
             shape['control_grid'] = new_grid
+        
+        ShapeCache.bump_version(shape)
     
     def rotate_shape(self, shape, angle_deg, center):
         """旋转图形"""
@@ -902,14 +1313,16 @@ class DrawingWidget(QWidget):
         elif shape['tool'] == 'polygon':
             shape['points'] = [rotate_point(p, center, cos_a, sin_a) for p in shape['points']]
         
-        elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
+        elif shape['tool'] in ['bezier_curve', 'bspline_curve', 'triangular_surface']:
             shape['control_points'] = [rotate_point(p, center, cos_a, sin_a) for p in shape['control_points']]
         
-        elif shape['tool'] == 'bezier_surface':
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
             new_grid = []
             for row in shape['control_grid']:
                 new_grid.append([rotate_point(p, center, cos_a, sin_a) for p in row])
             shape['control_grid'] = new_grid
+        
+        ShapeCache.bump_version(shape)
     
     def scale_shape(self, shape, sx, sy, center):
         """缩放图形"""
@@ -925,11 +1338,13 @@ class DrawingWidget(QWidget):
         elif shape['tool'] == 'polygon':
             shape['points'] = [scale_point(p, center, sx, sy) for p in shape['points']]
         
-        elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
+        elif shape['tool'] in ['bezier_curve', 'bspline_curve', 'triangular_surface']:
             shape['control_points'] = [scale_point(p, center, sx, sy) for p in shape['control_points']]
         
-        elif shape['tool'] == 'bezier_surface':
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
             new_grid = []
             for row in shape['control_grid']:
                 new_grid.append([scale_point(p, center, sx, sy) for p in row])
-            shape['control_grid'] = new_grid
\ No newline at end of file
+            shape['control_grid'] = new_grid
+        
+        ShapeCache.bump_version(shape)
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+容量有限的缓存模块
+按最近使用的顺序保存条目，超出容量时淘汰最久未使用的条目，
+用于以采样数等参数为键的预计算表：视图缩放、细节层次变化时键不断变化，不能无限增长
+"""
+from collections import OrderedDict
+
+
+class LRUCache(OrderedDict):
+    """最近最少使用淘汰的字典，读写方式与 dict 相同"""
+
+    def __init__(self, capacity):
+        """
+        :param capacity: 最多保存的条目数
+        """
+        super().__init__()
+        self.capacity = capacity
+
+    def get(self, key, default=None):
+        """查找条目并标记为最近使用；不存在时返回default"""
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.capacity:
+            self.popitem(last=False)
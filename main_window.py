@@ -56,6 +56,14 @@ class MainWindow(QMainWindow):
             btn.setCursor(Qt.PointingHandCursor)
             toolbar.addWidget(btn)
         
+        # 曲线采样方式切换
+        sampling_btn = QPushButton("自适应采样")
+        sampling_btn.setCheckable(True)
+        sampling_btn.toggled.connect(self.set_curve_sampling)
+        sampling_btn.setToolTip("按屏幕空间容差自适应展平曲线、细分曲面")
+        sampling_btn.setFixedHeight(30)
+        toolbar.addWidget(sampling_btn)
+        
         toolbar.addSeparator()
         
         # 曲面工具
@@ -66,6 +74,20 @@ class MainWindow(QMainWindow):
         surface_btn.setCursor(Qt.PointingHandCursor)
         toolbar.addWidget(surface_btn)
         
+        b_spline_surface_btn = QPushButton("B样条曲面")
+        b_spline_surface_btn.clicked.connect(lambda: self.set_current_tool("B样条曲面"))
+        b_spline_surface_btn.setToolTip("创建B样条曲面")
+        b_spline_surface_btn.setFixedHeight(30)
+        b_spline_surface_btn.setCursor(Qt.PointingHandCursor)
+        toolbar.addWidget(b_spline_surface_btn)
+        
+        triangular_btn = QPushButton("三边Bézier曲面")
+        triangular_btn.clicked.connect(lambda: self.set_current_tool("三边Bézier曲面"))
+        triangular_btn.setToolTip("创建三边Bézier曲面")
+        triangular_btn.setFixedHeight(30)
+        triangular_btn.setCursor(Qt.PointingHandCursor)
+        toolbar.addWidget(triangular_btn)
+        
         # 曲面显示模式切换
         wireframe_btn = QPushButton("网格线")
         wireframe_btn.clicked.connect(lambda: self.set_surface_display_mode('wireframe'))
@@ -130,7 +152,9 @@ class MainWindow(QMainWindow):
             "多边形": "polygon",
             "Bézier曲线": "bezier_curve",
             "B样条曲线": "bspline_curve",
-            "Bézier曲面": "bezier_surface"
+            "Bézier曲面": "bezier_surface",
+            "B样条曲面": "bspline_surface",
+            "三边Bézier曲面": "triangular_surface"
         }
         tool_id = tool_map.get(tname, "select")
 
@@ -148,12 +172,27 @@ class MainWindow(QMainWindow):
         self.drawing_widget.surface_display_mode = mode
         if self.drawing_widget.selected_shape_index >= 0:
             shape = self.drawing_widget.shapes[self.drawing_widget.selected_shape_index]
-            if shape['tool'] == 'bezier_surface':
+            if shape['tool'] in ['bezier_surface', 'bspline_surface', 'triangular_surface']:
                 shape['display_mode'] = mode
+                self.drawing_widget.invalidate_static_layer()
                 self.drawing_widget.update()
         mode_name = "网格线" if mode == "wireframe" else "填充"
         self.statusBar().showMessage(f"曲面显示: {mode_name}")
     
+    def set_curve_sampling(self, adaptive):
+        """设置曲线、曲面采样方式（固定采样数或自适应展平/细分）"""
+        mode = 'adaptive' if adaptive else 'fixed'
+        self.drawing_widget.curve_sampling = mode
+        self.drawing_widget.surface_sampling = mode
+        if self.drawing_widget.selected_shape_index >= 0:
+            shape = self.drawing_widget.shapes[self.drawing_widget.selected_shape_index]
+            if shape['tool'] in ['bezier_curve', 'bspline_curve', 'bezier_surface']:
+                shape['sampling'] = mode
+                self.drawing_widget.invalidate_static_layer()
+        self.drawing_widget.update()
+        mode_name = "自适应" if adaptive else "固定"
+        self.statusBar().showMessage(f"曲线/曲面采样: {mode_name}")
+    
     def apply_transform(self, transform_type):
         """应用变换到选中的图形"""
         from PyQt5.QtWidgets import QInputDialog
@@ -303,6 +342,7 @@ class MainWindow(QMainWindow):
                         self.drawing_widget.shapes.append(shape)
                 
                 # 更新画布
+                self.drawing_widget.invalidate_static_layer()
                 self.drawing_widget.update()
                 QMessageBox.information(self, "成功", "绘图已加载！")
                 
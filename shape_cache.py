@@ -0,0 +1,721 @@
+"""
+图形几何缓存模块
+将曲线、曲面的采样结果等派生数据保存在图形字典的 'cache' 项中，
+重绘时直接复用，控制点变化时只做必要的局部更新。
+每个图形带有几何版本号 'version'，所有修改几何的操作都要调用 bump_version
+（局部更新函数会自行更新版本号），缓存以版本号为键，命中判断不需要比较坐标
+"""
+import math
+from bisect import bisect_left, bisect_right
+import numpy as np
+from curve_algorithms import CurveAlgorithms
+from surface_algorithms import SurfaceAlgorithms
+from spatial_index import SpatialIndex
+
+
+class ShapeCache:
+    """图形几何缓存类"""
+    
+    # 几何查询（弧长、拾取）所用折线的展平容差，场景坐标，与视图缩放无关
+    GEOMETRY_TOLERANCE = 0.1
+    
+    # 控制点均匀网格索引的格子边长，场景坐标
+    CONTROL_POINT_CELL_SIZE = 32.0
+    
+    # 填充曲面图像的像素数上限；视图放大超出的部分由绘制时的缩放补足
+    IMAGE_PIXEL_BUDGET = 1 << 20
+    
+    # 几何改变后可以局部更新、不随版本号加一而释放的缓存项
+    INCREMENTAL_ENTRIES = ('bezier_segments', 'b_spline', 'surface')
+    
+    # 缓存命中统计，用于确认静态场景的重绘不做几何计算
+    stats = {'hits': 0, 'misses': 0}
+    
+    @staticmethod
+    def invalidate(shape):
+        """清除图形的全部缓存"""
+        shape.pop('cache', None)
+    
+    @staticmethod
+    def version(shape):
+        """图形当前的几何版本号"""
+        return shape.get('version', 0)
+    
+    @staticmethod
+    def bump_version(shape):
+        """
+        图形几何改变后调用：版本号加一，以旧版本为键的缓存随之失效并立即释放，
+        只保留局部更新函数（update_b_spline_point、update_surface_point）要在原处改写的缓存项
+        :return: 新的版本号
+        """
+        cache = shape.get('cache')
+        if cache:
+            for name in [name for name in cache if name not in ShapeCache.INCREMENTAL_ENTRIES]:
+                del cache[name]
+        shape['version'] = shape.get('version', 0) + 1
+        return shape['version']
+    
+    @staticmethod
+    def reset_stats():
+        """清零缓存命中统计"""
+        ShapeCache.stats['hits'] = 0
+        ShapeCache.stats['misses'] = 0
+    
+    @staticmethod
+    def _lookup(shape, name, key):
+        """
+        查找缓存项并计入命中统计
+        :return: 键匹配的缓存项；未命中时返回None
+        """
+        entry = shape.setdefault('cache', {}).get(name)
+        if entry is not None and entry['key'] == key:
+            ShapeCache.stats['hits'] += 1
+            return entry
+        ShapeCache.stats['misses'] += 1
+        return None
+    
+    @staticmethod
+    def _bezier_key(shape, num_samples):
+        """Bézier曲线采样缓存键"""
+        return (num_samples, ShapeCache.version(shape))
+    
+    @staticmethod
+    def _b_spline_key(shape, num_samples, knot_type):
+        """B样条曲线采样缓存键"""
+        return (shape.get('degree', 3), num_samples, knot_type, ShapeCache.version(shape))
+    
+    @staticmethod
+    def _segments_key(shape, knot_type):
+        """分段Bézier形式缓存键"""
+        return (shape.get('degree', 3), knot_type, ShapeCache.version(shape))
+    
+    @staticmethod
+    def _samples_per_segment(num_samples, segment_count):
+        """把整条曲线的采样数均摊到各段"""
+        return max(1, math.ceil(num_samples / max(segment_count, 1)))
+    
+    @staticmethod
+    def bezier_segments(shape, knot_type='clamped'):
+        """
+        获取B样条曲线的分段Bézier形式（控制点不变时直接复用缓存）
+        绘制、自适应展平等都基于该形式使用Bézier算法
+        :param shape: bspline_curve 图形
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 分段控制点数组，形状 (K, degree+1, 2)；控制点不足时K为0
+        """
+        key = ShapeCache._segments_key(shape, knot_type)
+        entry = ShapeCache._lookup(shape, 'bezier_segments', key)
+        if entry is None:
+            degree = key[0]
+            points = [(p.x(), p.y()) for p in shape.get('control_points', [])]
+            n = len(points)
+            if n < degree + 1:
+                knots = []
+                spans = []
+                segments = np.empty((0, degree + 1, 2))
+            else:
+                knots = CurveAlgorithms.generate_knots(n, degree, knot_type)
+                spans = CurveAlgorithms.b_spline_segment_spans(n, degree, knots)
+                segments = np.array([
+                    CurveAlgorithms.b_spline_segment_to_bezier(points, degree, knots, span)
+                    for span in spans
+                ], dtype=float).reshape(-1, degree + 1, 2)
+            entry = {'key': key, 'points': points, 'knots': knots, 'spans': spans, 'segments': segments}
+            shape['cache']['bezier_segments'] = entry
+        return entry['segments']
+    
+    @staticmethod
+    def _update_bezier_segments(shape, index, old_version, new_version):
+        """
+        控制点index移动后重新提取受影响的Bézier段
+        :param old_version, new_version: 移动前后的几何版本号，缓存项须对应移动前的版本
+        :return: 受影响段的索引范围 (start, stop)；没有可用缓存时返回None
+        """
+        entry = shape.get('cache', {}).get('bezier_segments')
+        if entry is None:
+            return None
+        degree, knot_type, version = entry['key']
+        coords = entry['points']
+        if version != old_version or len(coords) != len(shape.get('control_points', [])) \
+                or not entry['spans']:
+            return None
+        
+        point = shape['control_points'][index]
+        coords[index] = (point.x(), point.y())
+        entry['key'] = (degree, knot_type, new_version)
+        
+        # 区间span的Bézier段只依赖 P_{span-degree} ... P_{span}
+        spans = entry['spans']
+        start = bisect_left(spans, index)
+        stop = bisect_right(spans, index + degree)
+        for k in range(start, stop):
+            entry['segments'][k] = CurveAlgorithms.b_spline_segment_to_bezier(
+                coords, degree, entry['knots'], spans[k])
+        return (start, stop)
+    
+    @staticmethod
+    def bezier_samples(shape, num_samples=100):
+        """
+        获取Bézier曲线的采样点（控制点未变化时直接复用缓存）
+        :param shape: bezier_curve 图形
+        :param num_samples: 采样点数量
+        :return: 曲线点数组，形状 (num_samples+1, 2)
+        """
+        key = ShapeCache._bezier_key(shape, num_samples)
+        entry = ShapeCache._lookup(shape, 'bezier', key)
+        if entry is None:
+            control = CurveAlgorithms.points_to_array(shape.get('control_points', []))
+            curve = CurveAlgorithms.bezier_curves_batch(control[None], num_samples)[0]
+            entry = {'key': key, 'curve': curve}
+            shape['cache']['bezier'] = entry
+        return entry['curve']
+    
+    @staticmethod
+    def b_spline_samples(shape, num_samples=100, knot_type='clamped'):
+        """
+        获取B样条曲线的采样点（控制点未变化时直接复用缓存）
+        :param shape: bspline_curve 图形
+        :param num_samples: 采样点数量
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 曲线点数组，形状 (S, 2)
+        """
+        key = ShapeCache._b_spline_key(shape, num_samples, knot_type)
+        entry = ShapeCache._lookup(shape, 'b_spline', key)
+        if entry is None:
+            segments = ShapeCache.bezier_segments(shape, knot_type)
+            per_segment = ShapeCache._samples_per_segment(num_samples, len(segments))
+            entry = {
+                'key': key,
+                'per_segment': per_segment,
+                'curve': CurveAlgorithms.sample_bezier_segments(segments, per_segment)
+            }
+            shape['cache']['b_spline'] = entry
+        return entry['curve']
+    
+    @staticmethod
+    def curve_display_points(shape, tolerance=0.5, scale=1.0, num_samples=100):
+        """
+        获取绘制用的曲线点
+        按图形的 sampling / algorithm 选择算法；固定采样的默认路径复用
+        bezier_samples / b_spline_samples，其余结果以 (算法参数, 几何版本) 为键缓存
+        :param shape: bezier_curve 或 bspline_curve 图形
+        :param tolerance: 自适应展平的屏幕空间容差（像素）
+        :param scale: 当前视图缩放比例
+        :param num_samples: 固定采样数
+        :return: 曲线点数组，形状 (N, 2)；控制点不足时返回None
+        """
+        control_points = shape.get('control_points', [])
+        adaptive = shape.get('sampling', 'fixed') == 'adaptive'
+        if shape['tool'] == 'bspline_curve':
+            # B样条曲线需要至少 degree+1 个控制点
+            if len(control_points) < shape.get('degree', 3) + 1:
+                return None
+            if not adaptive:
+                return ShapeCache.b_spline_samples(shape, num_samples)
+            method = ('adaptive', tolerance, scale)
+        else:
+            algorithm = shape.get('algorithm', 'bernstein')
+            if not adaptive and algorithm == 'bernstein':
+                return ShapeCache.bezier_samples(shape, num_samples)
+            method = ('adaptive', tolerance, scale) if adaptive else (algorithm, num_samples)
+        
+        key = (method, ShapeCache.version(shape))
+        entry = ShapeCache._lookup(shape, 'display', key)
+        if entry is None:
+            if shape['tool'] == 'bspline_curve':
+                # 基于缓存的分段Bézier形式自适应展平
+                points = CurveAlgorithms.flatten_bezier_segments(
+                    ShapeCache.bezier_segments(shape), tolerance, scale, as_array=True)
+            elif adaptive:
+                # 按当前缩放自适应展平
+                points = CurveAlgorithms.flatten_bezier_adaptive(
+                    control_points, tolerance, scale, as_array=True)
+            elif method[0] == 'de_casteljau':
+                points = CurveAlgorithms.bezier_curve_de_casteljau(control_points, num_samples, as_array=True)
+            else:
+                points = CurveAlgorithms.bezier_forward_difference(control_points, num_samples, as_array=True)
+            entry = {'key': key, 'points': points}
+            shape['cache']['display'] = entry
+        return entry['points']
+    
+    @staticmethod
+    def _curve_key(shape):
+        """曲线几何缓存键"""
+        return (shape['tool'], shape.get('degree', 3), ShapeCache.version(shape))
+    
+    @staticmethod
+    def curve_polyline(shape):
+        """
+        获取用于几何查询的曲线折线（控制点不变时直接复用缓存）
+        按固定的场景容差自适应展平，结果与视图缩放无关
+        :param shape: bezier_curve 或 bspline_curve 图形
+        :return: 折线顶点数组，形状 (N, 2)
+        """
+        key = ShapeCache._curve_key(shape)
+        entry = ShapeCache._lookup(shape, 'polyline', key)
+        if entry is None:
+            if shape['tool'] == 'bspline_curve':
+                segments = ShapeCache.bezier_segments(shape)
+            else:
+                control = CurveAlgorithms.points_to_array(shape.get('control_points', []))
+                segments = control[None] if len(control) >= 2 else []
+            points = CurveAlgorithms.flatten_bezier_segments(
+                segments, ShapeCache.GEOMETRY_TOLERANCE, as_array=True)
+            entry = {'key': key, 'points': points}
+            shape['cache']['polyline'] = entry
+        return entry['points']
+    
+    @staticmethod
+    def arc_length_table(shape):
+        """
+        获取曲线的累积弧长表（控制点不变时直接复用缓存）
+        :param shape: bezier_curve 或 bspline_curve 图形
+        :return: (points, lengths)，折线顶点数组及对应的累积弧长
+        """
+        key = ShapeCache._curve_key(shape)
+        entry = ShapeCache._lookup(shape, 'arc_length', key)
+        if entry is None:
+            points = ShapeCache.curve_polyline(shape)
+            entry = {'key': key, 'points': points, 'lengths': CurveAlgorithms.arc_length_table(points)}
+            shape['cache']['arc_length'] = entry
+        return entry['points'], entry['lengths']
+    
+    @staticmethod
+    def curve_bvh(shape):
+        """
+        获取曲线折线的线段包围盒层次结构（控制点不变时直接复用缓存）
+        :param shape: bezier_curve 或 bspline_curve 图形
+        :return: (points, bvh)，折线顶点数组及其包围盒层次结构
+        """
+        key = ShapeCache._curve_key(shape)
+        entry = ShapeCache._lookup(shape, 'bvh', key)
+        if entry is None:
+            points = ShapeCache.curve_polyline(shape)
+            entry = {'key': key, 'points': points, 'bvh': CurveAlgorithms.build_segment_bvh(points)}
+            shape['cache']['bvh'] = entry
+        return entry['points'], entry['bvh']
+    
+    @staticmethod
+    def shape_bounds(shape):
+        """
+        获取图形的边界矩形（几何版本不变时直接复用缓存）
+        :param shape: 任意图形
+        :return: QRect，与缓存共享，调用方不要修改
+        """
+        # shape_utils 依赖本模块，在函数内导入以避免循环导入
+        from shape_utils import ShapeUtils
+        key = ShapeCache.version(shape)
+        entry = ShapeCache._lookup(shape, 'bounds', key)
+        if entry is None:
+            entry = {'key': key, 'rect': ShapeUtils.get_shape_bounds(shape)}
+            shape['cache']['bounds'] = entry
+        return entry['rect']
+    
+    @staticmethod
+    def control_point_index(shape):
+        """
+        获取图形控制点的均匀网格索引（几何版本不变时直接复用缓存）
+        :param shape: 曲线或曲面图形
+        :return: SpatialIndex，曲线与三边曲面的键为控制点下标，
+                 bezier_surface/bspline_surface 的键为 (row, col)
+        """
+        key = ShapeCache.version(shape)
+        entry = ShapeCache._lookup(shape, 'control_index', key)
+        if entry is None:
+            index = SpatialIndex(ShapeCache.CONTROL_POINT_CELL_SIZE)
+            if 'control_grid' in shape:
+                for i, row in enumerate(shape['control_grid']):
+                    for j, p in enumerate(row):
+                        index.insert((i, j), (p.x(), p.y(), p.x(), p.y()))
+            else:
+                for i, p in enumerate(shape.get('control_points', [])):
+                    index.insert(i, (p.x(), p.y(), p.x(), p.y()))
+            entry = {'key': key, 'index': index}
+            shape['cache']['control_index'] = entry
+        return entry['index']
+    
+    @staticmethod
+    def evaluate_curves_batch(shapes, num_samples=100, knot_type='clamped'):
+        """
+        批量更新多条曲线的采样缓存
+        缓存失效的曲线按 (工具, 次数, 控制点数) 分组，每组只做一次向量化计算，
+        之后 bezier_samples / b_spline_samples 可直接命中缓存
+        :param shapes: 图形列表（非固定采样的曲线及其他图形会被跳过）
+        :param num_samples: 采样点数量
+        :param knot_type: B样条节点类型
+        """
+        groups = {}
+        for shape in shapes:
+            if shape['tool'] not in ['bezier_curve', 'bspline_curve']:
+                continue
+            if shape.get('sampling', 'fixed') != 'fixed':
+                continue
+            
+            n = len(shape.get('control_points', []))
+            if shape['tool'] == 'bezier_curve':
+                # 仅默认的Bernstein算法走批量路径
+                if shape.get('algorithm', 'bernstein') != 'bernstein' or n < 2:
+                    continue
+                degree = n - 1
+                name = 'bezier'
+                key = ShapeCache._bezier_key(shape, num_samples)
+            else:
+                degree = shape.get('degree', 3)
+                if n < degree + 1:
+                    continue
+                name = 'b_spline'
+                key = ShapeCache._b_spline_key(shape, num_samples, knot_type)
+            
+            entry = shape.get('cache', {}).get(name)
+            if entry is not None and entry['key'] == key:
+                continue
+            groups.setdefault((shape['tool'], degree, n), []).append((shape, key))
+        
+        for (tool, degree, n), members in groups.items():
+            ShapeCache.stats['misses'] += len(members)
+            if tool == 'bezier_curve':
+                controls = np.array([
+                    CurveAlgorithms.points_to_array(shape['control_points']) for shape, _ in members
+                ])
+                curves = CurveAlgorithms.bezier_curves_batch(controls, num_samples)
+                for (shape, key), curve in zip(members, curves):
+                    shape.setdefault('cache', {})['bezier'] = {'key': key, 'curve': curve}
+            else:
+                # 同组B样条的分段数相同，所有Bézier段叠在一起一次计算
+                segments = np.array([ShapeCache.bezier_segments(shape, knot_type) for shape, _ in members])
+                count = segments.shape[1]
+                per_segment = ShapeCache._samples_per_segment(num_samples, count)
+                curves = CurveAlgorithms.bezier_curves_batch(segments.reshape(-1, degree + 1, 2), per_segment)
+                curves = curves.reshape(len(members), count, per_segment + 1, 2)
+                for (shape, key), curve in zip(members, curves):
+                    shape['cache']['b_spline'] = {
+                        'key': key,
+                        'per_segment': per_segment,
+                        'curve': np.concatenate([curve[:, :-1].reshape(-1, 2), curve[-1, -1:]])
+                    }
+    
+    @staticmethod
+    def update_b_spline_point(shape, index):
+        """
+        单个控制点移动后局部更新B样条缓存
+        由局部支撑性，只重新提取受影响的degree+1个Bézier段并重算这些段的采样点，
+        其余部分保持不变
+        同时更新几何版本号，调用方无需再调用 bump_version
+        :param shape: bspline_curve 图形（control_points[index] 已更新）
+        :param index: 被移动的控制点索引
+        :return: 是否完成局部更新（没有可用缓存时返回False，下次绘制时整体重算）
+        """
+        old_version = ShapeCache.version(shape)
+        new_version = ShapeCache.bump_version(shape)
+        affected = ShapeCache._update_bezier_segments(shape, index, old_version, new_version)
+        if affected is None:
+            return False
+        
+        entry = shape['cache'].get('b_spline')
+        if entry is None or entry['key'][3] != old_version:
+            return True
+        entry['key'] = entry['key'][:3] + (new_version,)
+        
+        start, stop = affected
+        if stop > start:
+            per_segment = entry['per_segment']
+            segments = shape['cache']['bezier_segments']['segments']
+            entry['curve'][start * per_segment:stop * per_segment + 1] = \
+                CurveAlgorithms.sample_bezier_segments(segments[start:stop], per_segment)
+        return True
+    
+    @staticmethod
+    def bezier_surface_samples(shape, u_samples=20, v_samples=20):
+        """
+        获取Bézier曲面的采样网格（控制网格未变化时直接复用缓存）
+        :param shape: bezier_surface 图形
+        :param u_samples: u方向采样数
+        :param v_samples: v方向采样数
+        :return: 曲面点数组，形状 (u_samples+1, v_samples+1, 2)
+        """
+        control_grid = shape.get('control_grid', [])
+        key = (('fixed', u_samples, v_samples), ShapeCache.version(shape))
+        entry = ShapeCache._lookup(shape, 'surface', key)
+        if entry is None:
+            surface_data = SurfaceAlgorithms.bezier_surface_matrix(control_grid, u_samples, v_samples)
+            entry = {
+                'key': key,
+                'control': SurfaceAlgorithms.control_grid_to_array(control_grid),
+                'basis_u': CurveAlgorithms.bernstein_matrix(len(control_grid) - 1, u_samples),
+                'basis_v': CurveAlgorithms.bernstein_matrix(len(control_grid[0]) - 1, v_samples),
+                'points': surface_data['points']
+            }
+            shape['cache']['surface'] = entry
+        return entry['points']
+    
+    @staticmethod
+    def bezier_surface_adaptive(shape, tolerance=0.5, scale=1.0):
+        """
+        获取Bézier曲面按屏幕空间平坦度自适应细分的采样网格
+        与固定采样共用 'surface' 缓存项，控制网格、容差或缩放变化时重新细分
+        :param shape: bezier_surface 图形
+        :param tolerance: 屏幕空间容差（像素）
+        :param scale: 当前视图缩放比例
+        :return: 曲面点数组，形状 (len(u_params), len(v_params), 2)
+        """
+        control_grid = shape.get('control_grid', [])
+        key = (('adaptive', tolerance, scale), ShapeCache.version(shape))
+        entry = ShapeCache._lookup(shape, 'surface', key)
+        if entry is None:
+            surface_data = SurfaceAlgorithms.bezier_surface_adaptive(control_grid, tolerance, scale)
+            entry = {
+                'key': key,
+                'control': SurfaceAlgorithms.control_grid_to_array(control_grid),
+                'basis_u': surface_data['basis_u'],
+                'basis_v': surface_data['basis_v'],
+                'points': surface_data['points']
+            }
+            shape['cache']['surface'] = entry
+        return entry['points']
+    
+    @staticmethod
+    def b_spline_surface_samples(shape, u_samples=20, v_samples=20):
+        """
+        获取B样条曲面的采样网格（控制网格未变化时直接复用缓存）
+        :param shape: bspline_surface 图形
+        :param u_samples: u方向采样数
+        :param v_samples: v方向采样数
+        :return: 曲面点数组，形状 (u_samples+1, v_samples+1, 2)
+        """
+        control_grid = shape.get('control_grid', [])
+        degree = shape.get('degree', 3)
+        knot_type = shape.get('knot_type', 'clamped')
+        key = (('b_spline', degree, knot_type, u_samples, v_samples), ShapeCache.version(shape))
+        entry = ShapeCache._lookup(shape, 'surface', key)
+        if entry is None:
+            surface_data = SurfaceAlgorithms.b_spline_surface_matrix(
+                control_grid, degree, u_samples, v_samples, knot_type)
+            degree_u, degree_v = SurfaceAlgorithms.b_spline_surface_degrees(control_grid, degree)
+            entry = {
+                'key': key,
+                'control': SurfaceAlgorithms.control_grid_to_array(control_grid),
+                'basis_u': SurfaceAlgorithms.b_spline_basis_matrix(
+                    len(control_grid), degree_u, u_samples, knot_type),
+                'basis_v': SurfaceAlgorithms.b_spline_basis_matrix(
+                    len(control_grid[0]), degree_v, v_samples, knot_type),
+                'points': surface_data['points']
+            }
+            shape['cache']['surface'] = entry
+        return entry['points']
+    
+    @staticmethod
+    def image_scale(vertices, scale):
+        """
+        选择填充曲面图像的光栅化分辨率（每个场景单位的像素数）
+        取不小于视图缩放的2的整数次幂，缩放在相邻两级之间变化时沿用同一张图像；
+        图像像素数超过 IMAGE_PIXEL_BUDGET 时逐级减半
+        :param vertices: 网格顶点坐标，形状 (..., 2)
+        :param scale: 视图缩放比例
+        """
+        resolution = 2.0 ** math.ceil(math.log2(scale))
+        extent = np.ptp(np.asarray(vertices).reshape(-1, 2), axis=0) + 1
+        while resolution > 0.125 and extent[0] * extent[1] * resolution * resolution > ShapeCache.IMAGE_PIXEL_BUDGET:
+            resolution /= 2
+        return resolution
+    
+    @staticmethod
+    def _store_image(shape, key, vertices, colors, triangles, scale, depths=None):
+        """
+        渲染图形的填充网格并存入 'image' 缓存项
+        :return: (QImage, (x, y, width, height))
+        """
+        image, rect = SurfaceAlgorithms.render_mesh_image(vertices, colors, triangles, scale, depths)
+        shape['cache']['image'] = {'key': key, 'image': image, 'rect': rect}
+        return image, rect
+    
+    @staticmethod
+    def surface_shading(shape):
+        """
+        获取曲面采样点的深度与光照强度
+        高度与坐标共用同一组基矩阵：Z = Bu · H · Bvᵀ，H 为控制点高度；
+        由三维采样网格计算法向量和Lambert光照。
+        使用最近一次采样得到的 'surface' 缓存项，采样方式或几何版本（含高度）变化时重算
+        :param shape: bezier_surface 或 bspline_surface 图形（已完成采样）
+        :return: (depths, intensity)，形状均为 (U, V)
+        """
+        surface = shape['cache']['surface']
+        key = surface['key']
+        entry = ShapeCache._lookup(shape, 'shading', key)
+        if entry is None:
+            control_shape = surface['control'].shape[:2]
+            heights = np.array(shape.get('heights') or np.zeros(control_shape), dtype=float)
+            if heights.shape != control_shape:
+                heights = np.zeros(control_shape)
+            depths = surface['basis_u'] @ heights @ surface['basis_v'].T
+            points = np.dstack([surface['points'], depths])
+            intensity = SurfaceAlgorithms.lambert_shading(SurfaceAlgorithms.surface_normals(points))
+            entry = {'key': key, 'depths': depths, 'intensity': intensity}
+            shape['cache']['shading'] = entry
+        return entry['depths'], entry['intensity']
+    
+    @staticmethod
+    def surface_image(shape, color1, color2, scale=1.0):
+        """
+        获取张量积曲面（Bézier / B样条）填充模式的渲染图像
+        使用最近一次采样得到的网格，三角化后一次光栅化：
+        颜色沿u方向从color1渐变到color2并乘以Lambert光照，
+        顶点深度由控制点高度插值，经深度缓冲区消隐，翻折重叠处无需排序三角形；
+        只有采样网格、高度、颜色、显示模式或光栅化分辨率（见 image_scale）变化时才重新渲染
+        :param shape: bezier_surface 或 bspline_surface 图形（已完成采样）
+        :param color1, color2: 渐变的起止颜色
+        :param scale: 视图缩放比例
+        :return: (QImage, (x, y, width, height))，后者为图像在场景坐标中的位置
+        """
+        rgba1 = SurfaceAlgorithms.color_to_rgba(color1)
+        rgba2 = SurfaceAlgorithms.color_to_rgba(color2)
+        points = shape['cache']['surface']['points']
+        scale = ShapeCache.image_scale(points, scale)
+        key = (shape['cache']['surface']['key'], tuple(rgba1), tuple(rgba2),
+               shape.get('display_mode', 'wireframe'), scale)
+        entry = ShapeCache._lookup(shape, 'image', key)
+        if entry is not None:
+            return entry['image'], entry['rect']
+        
+        depths, intensity = ShapeCache.surface_shading(shape)
+        rows, cols = points.shape[:2]
+        t = np.repeat(np.linspace(0.0, 1.0, rows), cols)[:, None]
+        colors = rgba1 * (1 - t) + rgba2 * t
+        colors[:, :3] *= intensity.reshape(-1, 1)
+        triangles = SurfaceAlgorithms.grid_triangles(rows, cols)
+        return ShapeCache._store_image(shape, key, points.reshape(-1, 2), colors, triangles, scale,
+                                       depths.ravel())
+    
+    @staticmethod
+    def _support(basis_column):
+        """基函数非零的连续采样区间"""
+        nonzero = np.flatnonzero(basis_column)
+        if len(nonzero) == 0:
+            return slice(0, 0)
+        return slice(nonzero[0], nonzero[-1] + 1)
+    
+    @staticmethod
+    def update_surface_point(shape, row, col):
+        """
+        单个控制点移动后对采样网格做秩1更新
+        曲面关于控制点是线性的，P[row][col] 移动 Δ 时
+        采样网格的变化为 Bu[:, row] · Bv[:, col]ᵀ · Δ，无需整体重算；
+        只更新两列基函数非零的采样区域，B样条曲面即为局部支撑的 (degree+1)² 个节点区间
+        同时更新几何版本号，调用方无需再调用 bump_version
+        :param shape: bezier_surface 或 bspline_surface 图形（control_grid[row][col] 已更新）
+        :param row, col: 被移动的控制点位置
+        :return: 是否完成增量更新（没有可用缓存时返回False，下次绘制时整体重算）
+        """
+        old_version = ShapeCache.version(shape)
+        new_version = ShapeCache.bump_version(shape)
+        entry = shape.get('cache', {}).get('surface')
+        if entry is None:
+            return False
+        sampling, version = entry['key']
+        if version != old_version or sampling[0] == 'adaptive':
+            # 自适应细分的采样参数依赖几何形状，交给下次绘制重新细分
+            return False
+        control = entry['control']
+        if control.shape[:2] != (len(shape['control_grid']), len(shape['control_grid'][0])):
+            return False
+        
+        point = shape['control_grid'][row][col]
+        delta = np.array([point.x(), point.y()], dtype=float) - control[row, col]
+        control[row, col] = (point.x(), point.y())
+        
+        rows = ShapeCache._support(entry['basis_u'][:, row])
+        cols = ShapeCache._support(entry['basis_v'][:, col])
+        weights = np.outer(entry['basis_u'][rows, row], entry['basis_v'][cols, col])
+        entry['points'][rows, cols] += np.multiply.outer(weights, delta)
+        
+        entry['key'] = (sampling, new_version)
+        return True
+    
+    @staticmethod
+    def triangular_surface_samples(shape, samples=20):
+        """
+        获取三边Bézier曲面的采样结果（控制点未变化时直接复用缓存）
+        :param shape: triangular_surface 图形
+        :param samples: 每条边的采样区间数
+        :return: SurfaceAlgorithms.triangular_bezier_surface_matrix 的结果字典
+        """
+        degree = shape.get('degree', 3)
+        key = (degree, samples, ShapeCache.version(shape))
+        entry = ShapeCache._lookup(shape, 'triangular', key)
+        if entry is None:
+            entry = {
+                'key': key,
+                'data': SurfaceAlgorithms.triangular_bezier_surface_matrix(
+                    shape.get('control_points', []), degree, samples)
+            }
+            shape['cache']['triangular'] = entry
+        return entry['data']
+    
+    @staticmethod
+    def triangular_surface_image(shape, color1, color2, scale=1.0, samples=20):
+        """
+        获取三边Bézier曲面填充模式的渲染图像，颜色随u从color1渐变到color2
+        :param shape: triangular_surface 图形
+        :param color1, color2: 渐变的起止颜色
+        :param scale: 视图缩放比例
+        :return: (QImage, (x, y, width, height))
+        """
+        surface_data = ShapeCache.triangular_surface_samples(shape, samples)
+        rgba1 = SurfaceAlgorithms.color_to_rgba(color1)
+        rgba2 = SurfaceAlgorithms.color_to_rgba(color2)
+        scale = ShapeCache.image_scale(surface_data['points'], scale)
+        key = (shape['cache']['triangular']['key'], tuple(rgba1), tuple(rgba2),
+               shape.get('display_mode', 'wireframe'), scale)
+        entry = ShapeCache._lookup(shape, 'image', key)
+        if entry is not None:
+            return entry['image'], entry['rect']
+        
+        t = surface_data['uv'][:, :1]
+        colors = rgba1 * (1 - t) + rgba2 * t
+        return ShapeCache._store_image(shape, key, surface_data['points'], colors,
+                                       surface_data['triangles'], scale)
+    
+    @staticmethod
+    def surface_mesh(shape):
+        """
+        获取曲面当前的三角形网格（即最近一次绘制所用的采样结果）
+        尚未采样过的曲面按默认采样数采样
+        :param shape: bezier_surface、bspline_surface 或 triangular_surface 图形
+        :return: (vertices, triangles, key)，key 在网格变化时随之变化
+        """
+        cache = shape.setdefault('cache', {})
+        if shape['tool'] == 'triangular_surface':
+            entry = cache.get('triangular')
+            samples = entry['key'][1] if entry is not None else 20
+            data = ShapeCache.triangular_surface_samples(shape, samples)
+            return data['points'], data['triangles'], cache['triangular']['key']
+        
+        # 沿用上次的采样方式；几何已变化时按同样方式重新采样
+        entry = cache.get('surface')
+        sampling = entry['key'][0] if entry is not None else None
+        if sampling is None:
+            sampling = ('b_spline', 30, 30) if shape['tool'] == 'bspline_surface' else ('fixed', 20, 20)
+        if sampling[0] == 'adaptive':
+            points = ShapeCache.bezier_surface_adaptive(shape, sampling[1], sampling[2])
+        elif sampling[0] == 'b_spline':
+            points = ShapeCache.b_spline_surface_samples(shape, sampling[-2], sampling[-1])
+        else:
+            points = ShapeCache.bezier_surface_samples(shape, sampling[1], sampling[2])
+        rows, cols = points.shape[:2]
+        return (points.reshape(-1, 2), SurfaceAlgorithms.grid_triangles(rows, cols),
+                cache['surface']['key'])
+    
+    @staticmethod
+    def surface_pick_grid(shape):
+        """
+        获取曲面网格及其三角形均匀网格索引
+        索引随网格缓存，网格不变时重复拾取不再重建；
+        拖拽时的增量更新只改动网格，索引留到下次拾取时按需重建
+        :param shape: 曲面图形
+        :return: (vertices, triangles, grid)
+        """
+        vertices, triangles, key = ShapeCache.surface_mesh(shape)
+        entry = ShapeCache._lookup(shape, 'pick', key)
+        if entry is None:
+            entry = {'key': key, 'grid': SurfaceAlgorithms.build_triangle_grid(vertices, triangles)}
+            shape['cache']['pick'] = entry
+        return vertices, triangles, entry['grid']
\ No newline at end of file
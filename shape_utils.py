@@ -1,5 +1,9 @@
-from PyQt5.QtCore import QPoint, QRect, Qt
-from PyQt5.QtGui import QPolygon
+from PyQt5.QtCore import QPoint, QPointF, QRect, Qt
+from PyQt5.QtGui import QPolygon, QPolygonF
+import numpy as np
+from curve_algorithms import CurveAlgorithms
+from surface_algorithms import SurfaceAlgorithms
+from shape_cache import ShapeCache
 
 class ShapeUtils:
     """图形工具类，包含各种图形相关的计算方法"""
@@ -13,6 +17,20 @@ class ShapeUtils:
         height = abs(end.y() - start.y())
         return QRect(x, y, width, height)
     
+    @staticmethod
+    def to_polygonf(coords):
+        """
+        将 (N, 2) 浮点坐标数组一次性转换为QPolygonF（保留亚像素精度）
+        直接写入QPolygonF的内存，不逐点创建QPointF对象
+        """
+        count = len(coords)
+        polygon = QPolygonF(count)
+        if count:
+            buffer = polygon.data()
+            buffer.setsize(count * 2 * np.dtype(np.float64).itemsize)
+            np.frombuffer(buffer, dtype=np.float64).reshape(count, 2)[:] = coords
+        return polygon
+    
     @staticmethod
     def is_point_near_line(point, start, end, tolerance=5):
         """判断点是否靠近直线"""
@@ -60,25 +78,19 @@ class ShapeUtils:
             polygon = QPolygon(shape['points'])
             return polygon.containsPoint(point, Qt.OddEvenFill)
         elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
-            # 检查是否靠近曲线的控制点区域
-            control_points = shape.get('control_points', [])
-            if not control_points:
-                return False
-            # 检查点是否在控制点附近（用于选择）
-            for cp in control_points:
-                dx = point.x() - cp.x()
-                dy = point.y() - cp.y()
-                if dx * dx + dy * dy <= 100:  # 10像素范围
-                    return True
-            return False
-        elif shape['tool'] == 'bezier_surface':
-            # 检查是否在曲面的控制网格区域
-            control_grid = shape.get('control_grid', [])
-            if not control_grid or not control_grid[0]:
+            # 检查点到曲线本身的距离，线段包围盒层次结构缓存在图形上
+            points, bvh = ShapeCache.curve_bvh(shape)
+            tolerance = max(5, shape.get('line_width', 1) / 2 + 3)
+            return CurveAlgorithms.is_point_near_polyline(points, bvh, point.x(), point.y(), tolerance)
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface', 'triangular_surface']:
+            # 检查点是否落在曲面的三角形网格上，三角形均匀网格索引缓存在图形上
+            if shape['tool'] == 'triangular_surface':
+                if not shape.get('control_points'):
+                    return False
+            elif not shape.get('control_grid') or not shape['control_grid'][0]:
                 return False
-            # 检查点是否在控制网格的边界内
-            bounds = ShapeUtils.get_shape_bounds(shape)
-            return bounds.contains(point)
+            vertices, triangles, grid = ShapeCache.surface_pick_grid(shape)
+            return SurfaceAlgorithms.find_triangle_at(vertices, triangles, grid, point.x(), point.y()) >= 0
         
         return False
     
@@ -95,8 +107,8 @@ class ShapeUtils:
             return ShapeUtils.get_rect_points(shape['start'], shape['end'])
         elif shape['tool'] == 'polygon':
             return QPolygon(shape['points']).boundingRect()
-        elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
-            # 曲线的边界：所有控制点的边界
+        elif shape['tool'] in ['bezier_curve', 'bspline_curve', 'triangular_surface']:
+            # 曲线（及三边曲面）的边界：所有控制点的边界
             control_points = shape.get('control_points', [])
             if not control_points:
                 return QRect()
@@ -105,7 +117,7 @@ class ShapeUtils:
             max_x = max(p.x() for p in control_points)
             max_y = max(p.y() for p in control_points)
             return QRect(min_x, min_y, max_x - min_x, max_y - min_y)
-        elif shape['tool'] == 'bezier_surface':
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
             # 曲面的边界：所有控制点的边界
             control_grid = shape.get('control_grid', [])
             if not control_grid or not control_grid[0]:
@@ -140,15 +152,15 @@ class ShapeUtils:
             avg_x = sum(point.x() for point in shape['points']) // len(shape['points'])
             avg_y = sum(point.y() for point in shape['points']) // len(shape['points'])
             return QPoint(avg_x, avg_y)
-        elif shape['tool'] in ['bezier_curve', 'bspline_curve']:
-            # 曲线中心：所有控制点的中心
+        elif shape['tool'] in ['bezier_curve', 'bspline_curve', 'triangular_surface']:
+            # 曲线（及三边曲面）中心：所有控制点的中心
             control_points = shape.get('control_points', [])
             if not control_points:
                 return QPoint(0, 0)
             avg_x = sum(p.x() for p in control_points) // len(control_points)
             avg_y = sum(p.y() for p in control_points) // len(control_points)
             return QPoint(avg_x, avg_y)
-        elif shape['tool'] == 'bezier_surface':
+        elif shape['tool'] in ['bezier_surface', 'bspline_surface']:
             # 曲面中心：所有控制点的中心
             control_grid = shape.get('control_grid', [])
             if not control_grid or not control_grid[0]:
@@ -160,4 +172,36 @@ class ShapeUtils:
             avg_y = sum(p.y() for p in all_points) // len(all_points)
             return QPoint(avg_x, avg_y)
         
-        return QPoint(0, 0)
\ No newline at end of file
+        return QPoint(0, 0)
+    
+    @staticmethod
+    def get_curve_length(shape):
+        """获取曲线的弧长"""
+        _, lengths = ShapeCache.arc_length_table(shape)
+        return float(lengths[-1]) if len(lengths) else 0.0
+    
+    @staticmethod
+    def get_curve_point_at_distance(shape, distance):
+        """
+        获取曲线上从起点沿曲线走过distance处的点
+        基于缓存的弧长表二分查找，查询时不重新积分
+        :return: QPointF；曲线为空时返回None
+        """
+        points, lengths = ShapeCache.arc_length_table(shape)
+        coords = CurveAlgorithms.point_at_distance(points, lengths, distance)
+        if coords is None:
+            return None
+        return QPointF(*coords)
+    
+    @staticmethod
+    def get_curve_points_evenly_spaced(shape, spacing):
+        """
+        沿曲线按等弧长间隔取点（用于虚线、标记、导出等）
+        :param spacing: 相邻点之间的弧长
+        :return: 形状为 (N, 2) 的坐标数组，包含起点
+        """
+        points, lengths = ShapeCache.arc_length_table(shape)
+        if len(points) == 0 or spacing <= 0:
+            return np.empty((0, 2))
+        distances = np.arange(0.0, lengths[-1] + 1e-9, spacing)
+        return CurveAlgorithms.points_at_distances(points, lengths, distances)
\ No newline at end of file
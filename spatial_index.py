@@ -0,0 +1,107 @@
+"""
+空间索引模块
+均匀网格：对象以键登记其边界矩形，每个格子记录与之相交的对象键，
+按位置查询时只检查查询范围覆盖的格子，代价与对象总数无关
+"""
+import math
+
+
+class SpatialIndex:
+    """均匀网格空间索引，用于按位置快速查找候选图形、控制点"""
+
+    def __init__(self, cell_size=64.0):
+        """
+        :param cell_size: 格子边长（场景坐标）
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> 与该格子相交的键的集合
+        self.rects = {}  # 键 -> 边界矩形 (x0, y0, x1, y1)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cell_range(self, rect):
+        """矩形覆盖的格子范围 (列0, 行0, 列1, 行1)，包含两端"""
+        x0, y0, x1, y1 = rect
+        size = self.cell_size
+        return (math.floor(x0 / size), math.floor(y0 / size),
+                math.floor(x1 / size), math.floor(y1 / size))
+
+    def insert(self, key, rect):
+        """
+        登记对象；键已存在时替换原有的矩形
+        :param key: 可哈希的对象键
+        :param rect: 边界矩形 (x0, y0, x1, y1)，x0 <= x1，y0 <= y1
+        """
+        if key in self.rects:
+            self.remove(key)
+        self.rects[key] = rect
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self.cells.setdefault((cx, cy), set()).add(key)
+
+    def remove(self, key):
+        """删除对象；键不存在时不做任何事"""
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def update(self, key, rect):
+        """对象移动后更新其矩形；覆盖的格子不变时只替换矩形"""
+        old_rect = self.rects.get(key)
+        if old_rect is not None and self._cell_range(old_rect) == self._cell_range(rect):
+            self.rects[key] = rect
+            return
+        self.insert(key, rect)
+
+    def clear(self):
+        """删除全部对象"""
+        self.cells.clear()
+        self.rects.clear()
+
+    def query_point(self, x, y):
+        """
+        查找边界矩形包含点 (x, y) 的对象
+        :return: 键的列表（无序）
+        """
+        size = self.cell_size
+        bucket = self.cells.get((math.floor(x / size), math.floor(y / size)), ())
+        rects = self.rects
+        return [key for key in bucket
+                if rects[key][0] <= x <= rects[key][2] and rects[key][1] <= y <= rects[key][3]]
+
+    def query_rect(self, rect):
+        """
+        查找边界矩形与rect相交的对象
+        :param rect: 查询矩形 (x0, y0, x1, y1)
+        :return: 键的集合
+        """
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # 查询范围比已占用的格子还多时直接遍历已占用的格子
+            buckets = [bucket for (cx, cy), bucket in self.cells.items()
+                       if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            buckets = [self.cells[(cx, cy)]
+                       for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                       if (cx, cy) in self.cells]
+
+        x0, y0, x1, y1 = rect
+        result = set()
+        for bucket in buckets:
+            for key in bucket:
+                if key in result:
+                    continue
+                r = self.rects[key]
+                if r[0] <= x1 and x0 <= r[2] and r[1] <= y1 and y0 <= r[3]:
+                    result.add(key)
+        return result
@@ -4,13 +4,26 @@
 不使用外部库，完全手动实现
 """
 from PyQt5.QtCore import QPoint
-from PyQt5.QtGui import QColor
+from PyQt5.QtGui import QColor, QImage
 import math
+import numpy as np
+from curve_algorithms import CurveAlgorithms
+from lru_cache import LRUCache
 
 
 class SurfaceAlgorithms:
     """参数曲面算法类"""
     
+    # 三边Bézier曲面的预计算缓存，条目数上限与曲线模块相同
+    # {(degree, samples): ndarray}
+    _triangular_basis_cache = LRUCache(CurveAlgorithms.CACHE_CAPACITY)
+    # {samples: (barycentric, triangles, lines)}
+    _triangular_lattice_cache = LRUCache(CurveAlgorithms.CACHE_CAPACITY)
+    # B样条曲面单方向基矩阵缓存 {(count, degree, num_samples, knot_type): ndarray}
+    _b_spline_matrix_cache = LRUCache(CurveAlgorithms.CACHE_CAPACITY)
+    # 规则网格的三角形索引缓存 {(rows, cols): ndarray}，自适应细分的网格尺寸随形状变化
+    _grid_triangles_cache = LRUCache(CurveAlgorithms.CACHE_CAPACITY)
+    
     @staticmethod
     def factorial(n):
         """计算阶乘"""
@@ -37,20 +50,24 @@ class SurfaceAlgorithms:
         return SurfaceAlgorithms.binomial_coefficient(n, i) * (t ** i) * ((1 - t) ** (n - i))
     
     @staticmethod
-    def bezier_surface(control_grid, u_samples=20, v_samples=20):
+    def bezier_surface(control_grid, u_samples=20, v_samples=20, as_array=False):
         """
         计算双三次Bézier曲面（张量积形式）
         :param control_grid: 控制点网格，二维列表 [[QPoint, ...], [...], ...]
                             control_grid[i][j] 表示第i行第j列的控制点
         :param u_samples: u方向采样数
         :param v_samples: v方向采样数
+        :param as_array: 是否以浮点数组形式返回（保留亚像素精度）
         :return: 字典 {
-            'points': 曲面点网格（二维列表）,
+            'points': 曲面点网格（二维列表；as_array时为 (U, V, 2) 数组）,
             'u_lines': u方向的线（用于网格显示）,
             'v_lines': v方向的线（用于网格显示）
         }
         """
         if not control_grid or not control_grid[0]:
+            if as_array:
+                empty = np.empty((0, 0, 2))
+                return {'points': empty, 'u_lines': empty, 'v_lines': empty}
             return {'points': [], 'u_lines': [], 'v_lines': []}
         
         m = len(control_grid)      # u方向控制点数
@@ -58,6 +75,7 @@ class SurfaceAlgorithms:
         
         # 生成曲面点
         surface_points = []
+        coords = np.empty((u_samples + 1, v_samples + 1, 2))
         for i in range(u_samples + 1):
             u = i / u_samples
             row_points = []
@@ -81,9 +99,18 @@ class SurfaceAlgorithms:
                         # 简单的高度计算（可以从控制点额外属性获取，这里简化处理）
                         # z += 0  # 2D投影，z暂时为0
                 
+                coords[i, j] = (x, y)
                 row_points.append(QPoint(int(x), int(y)))
             surface_points.append(row_points)
         
+        if as_array:
+            # v方向的线即点阵的转置
+            return {
+                'points': coords,
+                'u_lines': coords,
+                'v_lines': coords.transpose(1, 0, 2)
+            }
+        
         # 生成网格线
         u_lines = []  # 固定u，改变v的线
         v_lines = []  # 固定v，改变u的线
@@ -105,6 +132,381 @@ class SurfaceAlgorithms:
             'v_lines': v_lines
         }
     
+    @staticmethod
+    def control_grid_to_array(control_grid):
+        """
+        将控制点网格转换为坐标数组
+        :param control_grid: 控制点网格 [[QPoint, ...], ...]
+        :return: 形状为 (m, n, 2) 的浮点数组
+        """
+        return np.array([[(p.x(), p.y()) for p in row] for row in control_grid], dtype=float)
+    
+    @staticmethod
+    def bezier_surface_matrix(control_grid, u_samples=20, v_samples=20):
+        """
+        矩阵形式计算张量积Bézier曲面
+        整个采样网格为 S = Bu · P · Bvᵀ，Bu、Bv 按 (次数, 采样数) 缓存复用，
+        与 bezier_surface 结果一致，后者保留作为参考实现
+        :param control_grid: 控制点网格，二维列表 [[QPoint, ...], [...], ...]
+        :param u_samples: u方向采样数
+        :param v_samples: v方向采样数
+        :return: 字典 {
+            'points': 曲面点网格，形状 (u_samples+1, v_samples+1, 2),
+            'u_lines': u方向的线（即points的每一行）,
+            'v_lines': v方向的线（即points转置后的每一行）
+        }
+        """
+        if not control_grid or not control_grid[0]:
+            empty = np.empty((0, 0, 2))
+            return {'points': empty, 'u_lines': empty, 'v_lines': empty}
+        
+        control = SurfaceAlgorithms.control_grid_to_array(control_grid)
+        basis_u = CurveAlgorithms.bernstein_matrix(control.shape[0] - 1, u_samples)
+        basis_v = CurveAlgorithms.bernstein_matrix(control.shape[1] - 1, v_samples)
+        points = np.einsum('ui,ijd,vj->uvd', basis_u, control, basis_v, optimize=True)
+        
+        return {
+            'points': points,
+            'u_lines': points,
+            'v_lines': points.transpose(1, 0, 2)
+        }
+    
+    @staticmethod
+    def bezier_surface_at(control, u_params, v_params):
+        """
+        在非均匀参数网格上矩阵形式计算Bézier曲面
+        :param control: 控制点坐标数组，形状 (m, n, 2)
+        :param u_params: u方向参数值序列
+        :param v_params: v方向参数值序列
+        :return: (points, basis_u, basis_v)，points 形状为 (len(u_params), len(v_params), 2)
+        """
+        basis_u = CurveAlgorithms.bernstein_matrix_at(control.shape[0] - 1, u_params)
+        basis_v = CurveAlgorithms.bernstein_matrix_at(control.shape[1] - 1, v_params)
+        points = np.einsum('ui,ijd,vj->uvd', basis_u, control, basis_v, optimize=True)
+        return points, basis_u, basis_v
+    
+    @staticmethod
+    def split_bezier_patch(control, axis, t=0.5):
+        """
+        沿一个参数方向用de Casteljau算法把Bézier曲面片一分为二
+        :param control: 控制点坐标数组，形状 (m, n, 2)，或成批的 (k, m, n, 2)
+        :param axis: 0 表示沿u方向分割，1 表示沿v方向分割
+        :param t: 分割参数
+        :return: (前半片控制点, 后半片控制点)
+        """
+        axis -= 3
+        points = np.moveaxis(control, axis, 0)
+        first = [points[0]]
+        second = [points[-1]]
+        for _ in range(len(points) - 1):
+            points = points[:-1] * (1 - t) + points[1:] * t
+            first.append(points[0])
+            second.append(points[-1])
+        return (np.moveaxis(np.stack(first), 0, axis),
+                np.moveaxis(np.stack(second[::-1]), 0, axis))
+    
+    @staticmethod
+    def bezier_patch_flatness(control, axis):
+        """
+        计算Bézier曲面片沿一个参数方向的平坦度
+        即该方向上每条控制折线的内部控制点与首末点线性插值位置的最大距离；
+        线性参数化的直线段其控制点恰好位于这些插值位置，
+        因此该值同时度量了几何弯曲和参数分布的不均匀
+        :param control: 控制点坐标数组，形状 (m, n, 2)，或成批的 (k, m, n, 2)
+        :param axis: 0 表示u方向，1 表示v方向
+        :return: 平坦度（场景坐标单位）；成批输入时返回形状 (k,) 的数组
+        """
+        points = np.moveaxis(control, axis - 3, 0)
+        degree = len(points) - 1
+        if degree < 2:
+            return 0.0 if points.ndim == 3 else np.zeros(points.shape[1])
+        t = (np.arange(1, degree) / degree).reshape((-1,) + (1,) * (points.ndim - 1))
+        linear = points[0] * (1 - t) + points[-1] * t
+        offsets = points[1:-1] - linear
+        distance = np.hypot(offsets[..., 0], offsets[..., 1]).max(axis=(0, -1))
+        return float(distance) if distance.ndim == 0 else distance
+    
+    @staticmethod
+    def patch_twist(control):
+        """
+        曲面片的扭曲量 |P00 - P10 - P01 + P11| / 4，即四角双线性片与其三角化之间的最大偏差
+        :param control: 控制点坐标数组，形状 (..., m, n, 2)
+        :return: 扭曲量，形状与批维度相同
+        """
+        twist = control[..., 0, 0, :] - control[..., -1, 0, :] - control[..., 0, -1, :] + control[..., -1, -1, :]
+        return np.hypot(twist[..., 0], twist[..., 1]) / 4
+    
+    @staticmethod
+    def adaptive_surface_parameters(control, tolerance, max_depth=6, min_depth=2):
+        """
+        按平坦度自适应地选取Bézier曲面的u、v采样参数
+        曲面片与其四角双线性片的偏差不超过 u、v 两个方向平坦度之和，
+        三角化四边形另有扭曲误差（见 patch_twist）。
+        逐层对子片做四叉树细分，每个子片只用自己的控制点估计误差，
+        超出容差时只沿超出的方向分割：平坦度或扭曲集中在局部时，只有该处附近的参数区间加密。
+        各子片的分割位置汇总成全局的u、v参数序列，得到的非均匀网格相邻片共享边界点，不会产生裂缝；
+        平坦度关于控制点是线性的，de Casteljau分割只做凸组合，
+        已满足容差的子片被其他子片的分割线再次切开后误差不会增大
+        :param control: 控制点坐标数组，形状 (m, n, 2)
+        :param tolerance: 容差（场景坐标单位）
+        :param max_depth: 每个方向的最大细分深度
+        :param min_depth: 每个方向的最小细分深度（保证网格线模式下平坦曲面仍有内部网格线）
+        :return: (u_params, v_params)，均为升序数组
+        """
+        breaks = [{0.0, 1.0}, {0.0, 1.0}]
+        # 当前层的子片：控制点 (k, m, n, 2)，以及每个子片的参数区间 [start, end) 与细分深度，形状 (k, 2)
+        patches = control[None]
+        start = np.zeros((1, 2))
+        end = np.ones((1, 2))
+        depth = np.zeros((1, 2), dtype=int)
+        while len(patches):
+            flatness = np.stack([SurfaceAlgorithms.bezier_patch_flatness(patches, axis) for axis in (0, 1)], axis=1)
+            twist = SurfaceAlgorithms.patch_twist(patches)
+            failed = (flatness.sum(axis=1) + twist > tolerance)[:, None]
+            # 各方向分到一半容差，扭曲随任一方向的分割减半，由两个方向平摊
+            split = (depth < min_depth) | (failed & (flatness + twist[:, None] / 2 > tolerance / 2))
+            split &= depth < max_depth
+            # 不再分割的子片已满足容差或达到最大深度
+            keep = split.any(axis=1)
+            patches, start, end, depth, split = patches[keep], start[keep], end[keep], depth[keep], split[keep]
+            
+            for axis in (0, 1):
+                chosen = split[:, axis]
+                if not chosen.any():
+                    continue
+                middle = (start[chosen, axis] + end[chosen, axis]) / 2
+                breaks[axis].update(middle.tolist())
+                first, second = SurfaceAlgorithms.split_bezier_patch(patches[chosen], axis)
+                first_end, second_start = end[chosen], start[chosen]
+                first_end[:, axis] = second_start[:, axis] = middle
+                child_depth = depth[chosen]
+                child_depth[:, axis] += 1
+                rest = ~chosen
+                patches = np.concatenate([patches[rest], first, second])
+                start = np.concatenate([start[rest], start[chosen], second_start])
+                end = np.concatenate([end[rest], first_end, end[chosen]])
+                depth = np.concatenate([depth[rest], child_depth, child_depth])
+                split = np.concatenate([split[rest], split[chosen], split[chosen]])
+        
+        return np.array(sorted(breaks[0])), np.array(sorted(breaks[1]))
+    
+    @staticmethod
+    def bezier_surface_adaptive(control_grid, tolerance=0.5, scale=1.0, max_depth=6):
+        """
+        自适应细分计算Bézier曲面
+        平坦度按屏幕空间判断：场景坐标中的偏差乘以缩放比例后不超过 tolerance 像素，
+        因此小曲面片采样更少，放大显示时弯曲处自动加密
+        :param control_grid: 控制点网格，二维列表 [[QPoint, ...], [...], ...]
+        :param tolerance: 屏幕空间容差（像素）
+        :param scale: 当前视图缩放比例
+        :param max_depth: 每个方向的最大细分深度
+        :return: 字典 {
+            'points': 曲面点网格，形状 (len(u_params), len(v_params), 2),
+            'u_params': u方向参数, 'v_params': v方向参数,
+            'basis_u': u方向基矩阵, 'basis_v': v方向基矩阵,
+            'u_lines': u方向的线, 'v_lines': v方向的线
+        }
+        """
+        if not control_grid or not control_grid[0]:
+            empty = np.empty((0, 0, 2))
+            return {'points': empty, 'u_params': np.empty(0), 'v_params': np.empty(0),
+                    'u_lines': empty, 'v_lines': empty}
+        
+        control = SurfaceAlgorithms.control_grid_to_array(control_grid)
+        u_params, v_params = SurfaceAlgorithms.adaptive_surface_parameters(
+            control, tolerance / scale, max_depth)
+        points, basis_u, basis_v = SurfaceAlgorithms.bezier_surface_at(control, u_params, v_params)
+        
+        return {
+            'points': points,
+            'u_params': u_params,
+            'v_params': v_params,
+            'basis_u': basis_u,
+            'basis_v': basis_v,
+            'u_lines': points,
+            'v_lines': points.transpose(1, 0, 2)
+        }
+    
+    @staticmethod
+    def b_spline_basis_matrix(count, degree, num_samples, knot_type='clamped'):
+        """
+        计算一个参数方向的B样条基矩阵（按 (控制点数, 次数, 采样数, 节点类型) 缓存）
+        节点向量由 CurveAlgorithms.generate_knots 生成，
+        非零基函数取自 CurveAlgorithms.b_spline_basis_table
+        :param count: 该方向的控制点数
+        :param degree: 该方向的次数
+        :param num_samples: 采样点数量
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 形状为 (num_samples+1, count) 的只读矩阵，每行最多 degree+1 个非零值
+        """
+        key = (count, degree, num_samples, knot_type)
+        matrix = SurfaceAlgorithms._b_spline_matrix_cache.get(key)
+        if matrix is None:
+            knots = CurveAlgorithms.generate_knots(count, degree, knot_type)
+            spans, basis = CurveAlgorithms.b_spline_basis_table(knots, degree, num_samples)
+            matrix = np.zeros((len(spans), count))
+            columns = spans[:, None] - degree + np.arange(degree + 1)
+            matrix[np.arange(len(spans))[:, None], columns] = basis
+            matrix.setflags(write=False)
+            SurfaceAlgorithms._b_spline_matrix_cache[key] = matrix
+        return matrix
+    
+    @staticmethod
+    def b_spline_surface_degrees(control_grid, degree=3):
+        """
+        B样条曲面两个方向实际使用的次数（不超过该方向控制点数减一）
+        :return: (degree_u, degree_v)
+        """
+        return min(degree, len(control_grid) - 1), min(degree, len(control_grid[0]) - 1)
+    
+    @staticmethod
+    def b_spline_surface_matrix(control_grid, degree=3, u_samples=20, v_samples=20, knot_type='clamped'):
+        """
+        矩阵形式计算张量积B样条曲面
+        S = Nu · P · Nvᵀ，两个方向的基矩阵各自缓存；
+        每个控制点只影响 (degree+1)×(degree+1) 个节点区间内的采样点
+        :param control_grid: 控制点网格，二维列表 [[QPoint, ...], [...], ...]
+        :param degree: 次数（两个方向相同，控制点不足时自动降低）
+        :param u_samples: u方向采样数
+        :param v_samples: v方向采样数
+        :param knot_type: 节点类型 'uniform' 或 'clamped'
+        :return: 字典 {
+            'points': 曲面点网格，形状 (u_samples+1, v_samples+1, 2),
+            'u_lines': u方向的线, 'v_lines': v方向的线
+        }
+        """
+        if len(control_grid) < 2 or len(control_grid[0]) < 2:
+            empty = np.empty((0, 0, 2))
+            return {'points': empty, 'u_lines': empty, 'v_lines': empty}
+        
+        control = SurfaceAlgorithms.control_grid_to_array(control_grid)
+        degree_u, degree_v = SurfaceAlgorithms.b_spline_surface_degrees(control_grid, degree)
+        basis_u = SurfaceAlgorithms.b_spline_basis_matrix(control.shape[0], degree_u, u_samples, knot_type)
+        basis_v = SurfaceAlgorithms.b_spline_basis_matrix(control.shape[1], degree_v, v_samples, knot_type)
+        points = np.einsum('ui,ijd,vj->uvd', basis_u, control, basis_v, optimize=True)
+        
+        return {
+            'points': points,
+            'u_lines': points,
+            'v_lines': points.transpose(1, 0, 2)
+        }
+    
+    @staticmethod
+    def grid_triangles(rows, cols):
+        """
+        生成规则采样网格的三角形索引（按网格尺寸缓存）
+        网格点按行优先展平，每个四边形拆成两个三角形
+        :param rows, cols: 网格的行数、列数（点数）
+        :return: 形状为 (2*(rows-1)*(cols-1), 3) 的索引数组
+        """
+        key = (rows, cols)
+        triangles = SurfaceAlgorithms._grid_triangles_cache.get(key)
+        if triangles is None:
+            index = np.arange(rows * cols).reshape(rows, cols)
+            p00 = index[:-1, :-1].ravel()
+            p10 = index[1:, :-1].ravel()
+            p11 = index[1:, 1:].ravel()
+            p01 = index[:-1, 1:].ravel()
+            triangles = np.empty((2 * len(p00), 3), dtype=np.intp)
+            triangles[0::2] = np.stack([p00, p10, p11], axis=1)
+            triangles[1::2] = np.stack([p00, p11, p01], axis=1)
+            SurfaceAlgorithms._grid_triangles_cache[key] = triangles
+        return triangles
+    
+    @staticmethod
+    def build_triangle_grid(vertices, triangles, cells_per_side=None):
+        """
+        为三角形网格建立均匀网格索引，用于拾取时快速定位候选三角形
+        每个三角形登记到其包围盒覆盖的所有格子中，结果按格子编号以CSR形式存放
+        :param vertices: 形状为 (N, 2) 的顶点坐标
+        :param triangles: 形状为 (M, 3) 的三角形顶点索引
+        :param cells_per_side: 每边的格子数，省略时取 ceil(sqrt(M))，平均每格约一个三角形
+        :return: 字典 {
+            'origin': 网格左上角坐标 (x, y),
+            'cell_size': 格子边长 (w, h),
+            'size': 格子数 (nx, ny),
+            'starts': 每个格子在 items 中的起始位置，长度 nx*ny+1,
+            'items': 按格子排列的三角形索引
+        }
+        """
+        vertices = np.asarray(vertices, dtype=float)
+        triangles = np.asarray(triangles)
+        if len(triangles) == 0:
+            return {'origin': (0.0, 0.0), 'cell_size': (1.0, 1.0), 'size': (1, 1),
+                    'starts': np.zeros(2, dtype=np.intp), 'items': np.empty(0, dtype=np.intp)}
+        
+        if cells_per_side is None:
+            cells_per_side = max(1, int(math.ceil(math.sqrt(len(triangles)))))
+        origin = vertices.min(axis=0)
+        extent = np.maximum(vertices.max(axis=0) - origin, 1e-9)
+        cell_size = extent / cells_per_side
+        nx = ny = cells_per_side
+        
+        # 每个三角形包围盒覆盖的格子范围
+        corners = vertices[triangles]
+        low = np.clip(((corners.min(axis=1) - origin) // cell_size).astype(np.intp), 0, cells_per_side - 1)
+        high = np.clip(((corners.max(axis=1) - origin) // cell_size).astype(np.intp), 0, cells_per_side - 1)
+        spans = high - low + 1
+        counts = spans[:, 0] * spans[:, 1]
+        
+        # 展开为 (格子, 三角形) 对并按格子排序
+        owners = np.repeat(np.arange(len(triangles)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = low[owners, 0] + local % spans[owners, 0]
+        cell_y = low[owners, 1] + local // spans[owners, 0]
+        cells = cell_y * nx + cell_x
+        order = np.argsort(cells, kind='stable')
+        starts = np.searchsorted(cells[order], np.arange(nx * ny + 1))
+        
+        return {
+            'origin': (float(origin[0]), float(origin[1])),
+            'cell_size': (float(cell_size[0]), float(cell_size[1])),
+            'size': (nx, ny),
+            'starts': starts,
+            'items': owners[order]
+        }
+    
+    @staticmethod
+    def find_triangle_at(vertices, triangles, grid, x, y):
+        """
+        查找包含点 (x, y) 的三角形
+        先由均匀网格定位到一个格子，只对其中的候选三角形做向量化的边函数测试
+        :param vertices: 形状为 (N, 2) 的顶点坐标
+        :param triangles: 形状为 (M, 3) 的三角形顶点索引
+        :param grid: build_triangle_grid 的结果
+        :param x, y: 查询点坐标
+        :return: 三角形索引；不在网格上时返回 -1
+        """
+        nx, ny = grid['size']
+        cell_x = int(math.floor((x - grid['origin'][0]) / grid['cell_size'][0]))
+        cell_y = int(math.floor((y - grid['origin'][1]) / grid['cell_size'][1]))
+        # 恰好落在最大边界上的点归入最后一格
+        if cell_x == nx and x <= grid['origin'][0] + grid['cell_size'][0] * nx:
+            cell_x = nx - 1
+        if cell_y == ny and y <= grid['origin'][1] + grid['cell_size'][1] * ny:
+            cell_y = ny - 1
+        if not (0 <= cell_x < nx and 0 <= cell_y < ny):
+            return -1
+        
+        cell = cell_y * nx + cell_x
+        candidates = grid['items'][grid['starts'][cell]:grid['starts'][cell + 1]]
+        if len(candidates) == 0:
+            return -1
+        
+        corners = np.asarray(vertices, dtype=float)[np.asarray(triangles)[candidates]]
+        a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+        
+        def edge(p, q):
+            return (q[:, 0] - p[:, 0]) * (y - p[:, 1]) - (q[:, 1] - p[:, 1]) * (x - p[:, 0])
+        
+        e0, e1, e2 = edge(b, c), edge(c, a), edge(a, b)
+        # 两种绕向的三角形都接受（曲面翻折处三角形会反向）
+        inside = ((e0 >= 0) & (e1 >= 0) & (e2 >= 0)) | ((e0 <= 0) & (e1 <= 0) & (e2 <= 0))
+        # 退化三角形（三点共线）三条边函数全为0，不算命中
+        inside &= ~((e0 == 0) & (e1 == 0) & (e2 == 0))
+        hits = np.flatnonzero(inside)
+        return int(candidates[hits[0]]) if len(hits) else -1
+    
     @staticmethod
     def triangular_bernstein_basis(i, j, k, n, u, v, w):
         """
@@ -195,14 +597,166 @@ class SurfaceAlgorithms:
                     'domain_point': SurfaceAlgorithms.barycentric_to_cartesian(u, v, w, *domain_triangle)
                 })
         
-        # 生成三角形网格（用于填充）
-        # 这里简化处理，仅生成点
+        # 生成三角形网格（用于填充），采样点顺序与重心坐标格点一致
+        _, triangle_indices, _ = SurfaceAlgorithms.triangular_lattice(samples)
+        triangles = [tuple(t) for t in triangle_indices.tolist()]
         
         return {
             'points': surface_points,
             'triangles': triangles
         }
     
+    @staticmethod
+    def triangular_multi_indices(degree):
+        """
+        列出三边Bézier曲面的全部多重指标 (i, j, k)，i+j+k=degree
+        顺序与 triangular_lattice(degree) 的格点顺序一致，
+        因此控制网本身也可按格点的三角形和网格线连接
+        :param degree: 曲面次数
+        :return: 多重指标列表 [(i, j, k), ...]
+        """
+        return [(i, j, degree - i - j) for i in range(degree + 1) for j in range(degree + 1 - i)]
+    
+    @staticmethod
+    def triangular_lattice(samples):
+        """
+        生成重心坐标采样格点及其三角形索引（按采样数缓存）
+        格点按 u = a/samples（外层）、v = b/samples（内层）排列，w = 1-u-v
+        :param samples: 每条边的采样区间数
+        :return: (barycentric, triangles, lines)
+                 barycentric: 格点重心坐标，形状 (S, 3)
+                 triangles: 三角形顶点索引，形状 (samples², 3)
+                 lines: 三组等参数线（u、v、w分别为常数）的格点索引数组列表
+        """
+        lattice = SurfaceAlgorithms._triangular_lattice_cache.get(samples)
+        if lattice is not None:
+            return lattice
+        
+        # 第a行（u = a/samples）的起始格点序号
+        offsets = [0]
+        for a in range(samples + 1):
+            offsets.append(offsets[-1] + samples + 1 - a)
+        
+        barycentric = []
+        for a in range(samples + 1):
+            for b in range(samples + 1 - a):
+                u = a / samples
+                v = b / samples
+                barycentric.append((u, v, 1.0 - u - v))
+        
+        triangles = []
+        for a in range(samples):
+            for b in range(samples - a):
+                p0 = offsets[a] + b
+                p1 = p0 + 1
+                p2 = offsets[a + 1] + b
+                triangles.append((p0, p1, p2))
+                if b < samples - a - 1:
+                    triangles.append((p1, p2 + 1, p2))
+        
+        lines = []
+        # u为常数：同一行
+        for a in range(samples):
+            lines.append(np.arange(offsets[a], offsets[a + 1]))
+        # v为常数：每行取第b个
+        for b in range(samples):
+            lines.append(np.array([offsets[a] + b for a in range(samples + 1 - b)]))
+        # w为常数：每行取倒数第c个
+        for c in range(samples):
+            lines.append(np.array([offsets[a + 1] - 1 - c for a in range(samples + 1 - c)]))
+        
+        barycentric = np.array(barycentric).reshape(-1, 3)
+        triangles = np.array(triangles, dtype=int).reshape(-1, 3)
+        lattice = (barycentric, triangles, lines)
+        SurfaceAlgorithms._triangular_lattice_cache[samples] = lattice
+        return lattice
+    
+    @staticmethod
+    def triangular_basis_matrix(degree, samples):
+        """
+        计算三边Bernstein基矩阵（按 (次数, 采样数) 缓存）
+        第s行为第s个格点处的全部基函数值 n!/(i!j!k!) · u^i · v^j · w^k，
+        多重指标与系数只计算一次
+        :param degree: 曲面次数
+        :param samples: 采样数量
+        :return: 形状为 (S, K) 的只读矩阵，K = (degree+1)(degree+2)/2
+        """
+        key = (degree, samples)
+        matrix = SurfaceAlgorithms._triangular_basis_cache.get(key)
+        if matrix is None:
+            indices = np.array(SurfaceAlgorithms.triangular_multi_indices(degree))
+            coefficients = np.array([
+                SurfaceAlgorithms.factorial(degree) /
+                (SurfaceAlgorithms.factorial(i) * SurfaceAlgorithms.factorial(j) * SurfaceAlgorithms.factorial(k))
+                for i, j, k in indices.tolist()
+            ])
+            barycentric, _, _ = SurfaceAlgorithms.triangular_lattice(samples)
+            # w 可能因舍入略小于0，截断后再求幂
+            barycentric = np.clip(barycentric, 0.0, 1.0)
+            matrix = coefficients * np.prod(barycentric[:, None, :] ** indices[None, :, :], axis=2)
+            matrix.setflags(write=False)
+            SurfaceAlgorithms._triangular_basis_cache[key] = matrix
+        return matrix
+    
+    @staticmethod
+    def triangular_bezier_surface_matrix(control_points, degree, samples=20):
+        """
+        向量化计算三边Bézier曲面：所有格点一次矩阵乘法 S = B · P
+        :param control_points: 控制点字典 {(i,j,k): QPoint, ...}，
+                               或按 triangular_multi_indices(degree) 顺序排列的控制点列表
+        :param degree: 曲面次数
+        :param samples: 每条边的采样区间数
+        :return: 字典 {
+            'points': 曲面点数组，形状 (S, 2),
+            'uv': 格点重心坐标，形状 (S, 3),
+            'triangles': 三角形顶点索引，形状 (samples², 3),
+            'lines': 三组等参数线的点数组列表（用于网格显示）
+        }
+        """
+        if isinstance(control_points, dict):
+            control_points = [control_points[index]
+                              for index in SurfaceAlgorithms.triangular_multi_indices(degree)]
+        control = CurveAlgorithms.points_to_array(control_points)
+        
+        barycentric, triangles, lines = SurfaceAlgorithms.triangular_lattice(samples)
+        points = SurfaceAlgorithms.triangular_basis_matrix(degree, samples) @ control
+        return {
+            'points': points,
+            'uv': barycentric,
+            'triangles': triangles,
+            'lines': [points[line] for line in lines]
+        }
+    
+    @staticmethod
+    def surface_normals(points):
+        """
+        计算曲面采样网格的单位法向量（向量化）
+        沿u、v两个网格方向取中心差分作为切向量，法向量为二者叉积
+        :param points: 三维曲面点网格，形状 (U, V, 3)，第三个分量为高度z
+        :return: 形状为 (U, V, 3) 的单位法向量；退化处为 (0, 0, 1)
+        """
+        tangent_u = np.gradient(points, axis=0)
+        tangent_v = np.gradient(points, axis=1)
+        normals = np.cross(tangent_u, tangent_v)
+        length = np.linalg.norm(normals, axis=-1, keepdims=True)
+        degenerate = length[..., 0] < 1e-12
+        normals = normals / np.where(length < 1e-12, 1.0, length)
+        normals[degenerate] = (0.0, 0.0, 1.0)
+        return normals
+    
+    @staticmethod
+    def lambert_shading(normals, light_direction=(-0.4, -0.5, 1.0), ambient=0.35):
+        """
+        Lambert漫反射光照（双面光照，曲面翻折后的背面同样受光）
+        :param normals: 单位法向量数组，形状 (..., 3)
+        :param light_direction: 指向光源的方向（屏幕坐标系，y向下，z指向观察者）
+        :param ambient: 环境光比例
+        :return: 光照强度数组，形状 (...)，取值 [ambient, 1]
+        """
+        light = np.asarray(light_direction, dtype=float)
+        light = light / np.linalg.norm(light)
+        return ambient + (1 - ambient) * np.abs(normals @ light)
+    
     @staticmethod
     def interpolate_color(color1, color2, t):
         """
@@ -278,3 +832,245 @@ class SurfaceAlgorithms:
                     pixels.append((QPoint(x, y), color))
         
         return pixels
+    
+    @staticmethod
+    def color_to_rgba(color):
+        """
+        将颜色转换为RGBA浮点数组
+        :param color: QColor 或 (r, g, b[, a]) 序列；None 时按 interpolate_color 的约定取灰色
+        :return: 形状为 (4,) 的数组
+        """
+        if color is None:
+            return np.array([128, 128, 128, 255], dtype=float)
+        if isinstance(color, QColor):
+            return np.array([color.red(), color.green(), color.blue(), color.alpha()], dtype=float)
+        rgba = np.empty(4)
+        rgba[:3] = color[:3]
+        rgba[3] = color[3] if len(color) > 3 else 255
+        return rgba
+    
+    @staticmethod
+    def create_pixel_buffer(width, height):
+        """
+        创建连续的RGBA像素缓冲区（初始全透明）
+        :return: 形状为 (height, width, 4) 的 uint8 数组，字节序与 QImage.Format_RGBA8888 一致
+        """
+        return np.zeros((height, width, 4), dtype=np.uint8)
+    
+    @staticmethod
+    def pixel_buffer_to_qimage(buffer):
+        """
+        将像素缓冲区零拷贝包装为QImage
+        QImage直接引用缓冲区内存，返回的图像上保存了对缓冲区的引用
+        :param buffer: create_pixel_buffer 创建的数组
+        :return: QImage (Format_RGBA8888)
+        """
+        height, width = buffer.shape[:2]
+        image = QImage(buffer.data, width, height, buffer.strides[0], QImage.Format_RGBA8888)
+        image.pixel_buffer = buffer
+        return image
+    
+    @staticmethod
+    def rasterize_triangle(buffer, p0, p1, p2, color1, color2, color3, depth_buffer=None, depths=None):
+        """
+        使用边函数光栅化单个三角形，Gouraud插值颜色直接写入像素缓冲区
+        :param buffer: (height, width, 4) 的 uint8 像素缓冲区
+        :param p0, p1, p2: 三角形顶点 (x, y)，可为浮点数
+        :param color1, color2, color3: 三个顶点的颜色（QColor 或 RGBA 序列）
+        :param depth_buffer: 可选的 (height, width) 深度缓冲区，值越大越靠近观察者
+        :param depths: 三个顶点的深度 (z0, z1, z2)，与 depth_buffer 同时给出时进行深度测试
+        :return: 写入的像素数
+        """
+        colors = np.stack([SurfaceAlgorithms.color_to_rgba(c) for c in (color1, color2, color3)])
+        if depth_buffer is None:
+            depths = None
+        return SurfaceAlgorithms.rasterize_triangles(
+            buffer, [p0, p1, p2], colors, [(0, 1, 2)], depths=depths, depth_buffer=depth_buffer)
+    
+    # 每批写入的像素数上限，控制临时数组的内存占用
+    RASTER_BATCH_PIXELS = 1 << 18
+    
+    @staticmethod
+    def _edge_coefficients(ax, ay, bx, by):
+        """
+        边函数 (b - a) × (p - a) = A·(px - sx) + B·(py - sy) 的系数，(sx, sy) 是按规范顺序较小的端点
+        按端点的规范顺序计算后再按方向取反：共享边在相邻两个三角形中方向相反，
+        两侧的边函数值严格互为相反数；在两个端点处的值严格为0，
+        落在像素中心上的共享顶点也只归属一个三角形，左上规则不会重复或遗漏像素
+        :return: (A, B, sx, sy)，形状与输入相同
+        """
+        swap = (ax > bx) | ((ax == bx) & (ay > by))
+        sx = np.where(swap, bx, ax)
+        sy = np.where(swap, by, ay)
+        a = sy - np.where(swap, ay, by)
+        b = np.where(swap, ax, bx) - sx
+        sign = np.where(swap, -1.0, 1.0)
+        return a * sign, b * sign, sx, sy
+    
+    @staticmethod
+    def rasterize_triangles(buffer, vertices, colors, triangles, offset=(0, 0), depths=None, depth_buffer=None):
+        """
+        光栅化三角形网格（顶点颜色Gouraud插值），全部三角形一次性向量化处理
+        每个三角形包围盒内的每一行是一个跨度：由边函数解出跨度的起止列，
+        再用精确的边函数检验两端像素（采样点取像素中心，共享边按左上规则只归属一个三角形）；
+        三角形是凸的，两端在内部时整段都在内部。
+        颜色和深度沿x线性变化，跨度内每个像素只需一次乘加；
+        给出深度时同一像素的多个候选取最近的，再与深度缓冲区比较
+        :param buffer: (height, width, 4) 的 uint8 像素缓冲区
+        :param vertices: 形状为 (N, 2) 的顶点坐标
+        :param colors: 形状为 (N, 4) 的顶点RGBA颜色
+        :param triangles: 形状为 (M, 3) 的三角形顶点索引
+        :param offset: 缓冲区左上角对应的坐标，顶点坐标先减去该偏移
+        :param depths: 可选的顶点深度，形状 (N,)；给出时按深度缓冲区消隐，三角形无需排序
+        :param depth_buffer: 深度缓冲区，省略时新建并初始化为负无穷
+        :return: 写入的像素数
+        """
+        height, width = buffer.shape[:2]
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 2) - np.asarray(offset, dtype=float)
+        colors = np.asarray(colors, dtype=float).reshape(-1, 4)
+        triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        if depths is not None:
+            depths = np.asarray(depths, dtype=float).ravel()
+            if depth_buffer is None:
+                depth_buffer = np.full((height, width), -np.inf)
+        if len(triangles) == 0:
+            return 0
+        
+        # 统一为正面积（逆时针，y轴向下时为顺时针），去掉退化三角形
+        corners = vertices[triangles]
+        area = ((corners[:, 1, 0] - corners[:, 0, 0]) * (corners[:, 2, 1] - corners[:, 0, 1])
+                - (corners[:, 1, 1] - corners[:, 0, 1]) * (corners[:, 2, 0] - corners[:, 0, 0]))
+        flipped = area < 0
+        triangles = triangles.copy()
+        triangles[flipped, 1], triangles[flipped, 2] = triangles[flipped, 2], triangles[flipped, 1]
+        area = np.abs(area)
+        
+        # 包围盒裁剪到缓冲区
+        corners = vertices[triangles]
+        min_x = np.maximum(np.floor(corners[:, :, 0].min(axis=1)), 0).astype(np.int64)
+        max_x = np.minimum(np.ceil(corners[:, :, 0].max(axis=1)), width - 1).astype(np.int64)
+        min_y = np.maximum(np.floor(corners[:, :, 1].min(axis=1)), 0).astype(np.int64)
+        max_y = np.minimum(np.ceil(corners[:, :, 1].max(axis=1)), height - 1).astype(np.int64)
+        keep = (area > 0) & (min_x <= max_x) & (min_y <= max_y)
+        if not keep.any():
+            return 0
+        triangles, area = triangles[keep], area[keep]
+        min_x, max_x, min_y, max_y = min_x[keep], max_x[keep], min_y[keep], max_y[keep]
+        
+        # 三条边 v1→v2、v2→v0、v0→v1 的边函数分别是 v0、v1、v2 的重心权重（乘以面积）
+        edge_start = vertices[triangles[:, [1, 2, 0]]]
+        edge_end = vertices[triangles[:, [2, 0, 1]]]
+        coeff_a, coeff_b, origin_x, origin_y = SurfaceAlgorithms._edge_coefficients(
+            edge_start[..., 0], edge_start[..., 1], edge_end[..., 0], edge_end[..., 1])
+        # 左上规则：上边和左边上的像素计入
+        inclusive = (((edge_start[..., 1] == edge_end[..., 1]) & (edge_end[..., 0] > edge_start[..., 0]))
+                     | (edge_end[..., 1] < edge_start[..., 1]))
+        
+        # 跨度：每个三角形包围盒内的每一行
+        rows_per_triangle = max_y - min_y + 1
+        owner = np.repeat(np.arange(len(triangles)), rows_per_triangle)
+        span_row = min_y[owner] + np.arange(len(owner)) - np.repeat(
+            np.cumsum(rows_per_triangle) - rows_per_triangle, rows_per_triangle)
+        py = (span_row + 0.5)[:, None]
+        a, b = coeff_a[owner], coeff_b[owner]
+        sx, sy = origin_x[owner], origin_y[owner]
+        span_inclusive = inclusive[owner]
+        
+        def covered(columns):
+            values = a * ((columns + 0.5)[:, None] - sx) + b * (py - sy)
+            return np.where(span_inclusive, values >= 0, values > 0).all(axis=1)
+        
+        # 由边函数解出的起止列只用于估计，误差不超过一列，再用精确检验修正
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = sx - b * (py - sy) / a - 0.5
+        box_lo, box_hi = min_x[owner], max_x[owner]
+        lo = np.clip(np.where(a > 0, np.ceil(crossing), -np.inf).max(axis=1), box_lo, box_hi).astype(np.int64)
+        hi = np.clip(np.where(a < 0, np.floor(crossing), np.inf).min(axis=1), box_lo, box_hi).astype(np.int64)
+        for _ in range(2):
+            lo = np.where((lo <= hi) & ~covered(lo), lo + 1, lo)
+            hi = np.where((lo <= hi) & ~covered(hi), hi - 1, hi)
+        for _ in range(2):
+            lo = np.where((lo > box_lo) & covered(lo - 1), lo - 1, lo)
+            hi = np.where((hi < box_hi) & covered(hi + 1), hi + 1, hi)
+        valid = (lo <= hi) & covered(lo) & covered(hi)
+        if not valid.any():
+            return 0
+        owner, span_row, lo, hi = owner[valid], span_row[valid], lo[valid], hi[valid]
+        
+        # 重心权重沿x的增量与跨度起点处的值，颜色、深度是权重的线性组合
+        tri_colors = colors[triangles[owner]]
+        start_weights = (a[valid] * ((lo + 0.5)[:, None] - sx[valid]) + b[valid] * (py[valid] - sy[valid])) / area[owner, None]
+        step_weights = coeff_a[owner] / area[owner, None]
+        color_start = np.einsum('se,sed->sd', start_weights, tri_colors)
+        color_step = np.einsum('se,sed->sd', step_weights, tri_colors)
+        if depths is not None:
+            tri_depths = depths[triangles[owner]]
+            depth_start = np.einsum('se,se->s', start_weights, tri_depths)
+            depth_step = np.einsum('se,se->s', step_weights, tri_depths)
+        
+        # 按像素数分批展开跨度
+        lengths = hi - lo + 1
+        ends = np.cumsum(lengths)
+        batch_bounds = [0]
+        while batch_bounds[-1] < len(lengths):
+            base = ends[batch_bounds[-1] - 1] if batch_bounds[-1] else 0
+            stop = int(np.searchsorted(ends, base + SurfaceAlgorithms.RASTER_BATCH_PIXELS, side='right'))
+            batch_bounds.append(max(stop, batch_bounds[-1] + 1))
+        
+        flat_buffer = buffer.reshape(-1, 4)
+        flat_depth = None if depths is None else depth_buffer.reshape(-1)
+        written = 0
+        for first, last in zip(batch_bounds[:-1], batch_bounds[1:]):
+            n = lengths[first:last]
+            step = np.arange(int(n.sum())) - np.repeat(np.cumsum(n) - n, n)
+            pixels = np.repeat(span_row[first:last] * width + lo[first:last], n) + step
+            rgba = np.repeat(color_start[first:last], n, axis=0)
+            rgba += np.repeat(color_step[first:last], n, axis=0) * step[:, None]
+            
+            if depths is not None:
+                # 正交投影下深度在屏幕空间线性插值
+                z = np.repeat(depth_start[first:last], n) + np.repeat(depth_step[first:last], n) * step
+                # 同一像素被多个三角形覆盖（曲面翻折）时只保留最近的候选
+                base = pixels.min()
+                shared = np.bincount(pixels - base)[pixels - base] > 1
+                if shared.any():
+                    candidates = np.flatnonzero(shared)
+                    order = candidates[np.lexsort((z[candidates], pixels[candidates]))]
+                    sorted_pixels = pixels[order]
+                    nearest = order[np.append(sorted_pixels[1:] != sorted_pixels[:-1], True)]
+                    chosen = np.sort(np.concatenate([np.flatnonzero(~shared), nearest]))
+                else:
+                    chosen = np.arange(len(pixels))
+                chosen = chosen[z[chosen] > flat_depth[pixels[chosen]]]
+                pixels, rgba = pixels[chosen], rgba[chosen]
+                flat_depth[pixels] = z[chosen]
+            
+            np.clip(rgba, 0, 255, out=rgba)
+            rgba += 0.5
+            flat_buffer[pixels] = rgba.astype(np.uint8)
+            written += len(pixels)
+        
+        return written
+    
+    @staticmethod
+    def render_mesh_image(vertices, colors, triangles, scale=1.0, depths=None):
+        """
+        将三角形网格一次性光栅化为与其包围盒等大的图像
+        :param vertices: 形状为 (N, 2) 的顶点坐标（场景坐标）
+        :param colors: 形状为 (N, 4) 的顶点RGBA颜色
+        :param triangles: 形状为 (M, 3) 的三角形顶点索引
+        :param scale: 光栅化分辨率（每个场景单位的像素数），与视图缩放一致时图像不失真
+        :param depths: 可选的顶点深度，给出时使用深度缓冲区消隐
+        :return: (QImage, (x, y, width, height))，后者为图像在场景坐标中的位置
+        """
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        if len(vertices) == 0:
+            return QImage(), (0.0, 0.0, 0.0, 0.0)
+        origin = np.floor(vertices.min(axis=0) * scale)
+        extent = np.ceil(vertices.max(axis=0) * scale) - origin
+        width, height = int(extent[0]) + 1, int(extent[1]) + 1
+        
+        buffer = SurfaceAlgorithms.create_pixel_buffer(width, height)
+        SurfaceAlgorithms.rasterize_triangles(buffer, vertices * scale, colors, triangles, origin, depths)
+        image = SurfaceAlgorithms.pixel_buffer_to_qimage(buffer)
+        return image, (origin[0] / scale, origin[1] / scale, width / scale, height / scale)
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+曲线算法测试
+将加速后的求值方法与保留的参考实现（逐点Bernstein、Cox-de Boor递推、de Casteljau）对比，
+检查自适应展平的误差界，以及拖拽控制点时B样条局部更新与整体重算一致
+运行：python -m pytest test_curves.py 或 python test_curves.py
+"""
+import random
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPoint
+
+from curve_algorithms import CurveAlgorithms
+from shape_cache import ShapeCache
+from shape_utils import ShapeUtils
+
+
+def random_points(count, seed):
+    """生成固定随机种子的控制点列表"""
+    rng = random.Random(seed)
+    return [QPoint(rng.randint(0, 900), rng.randint(0, 700)) for _ in range(count)]
+
+
+def max_distance_to_polyline(polyline, points):
+    """points 中各点到折线的最大距离"""
+    return max(CurveAlgorithms.polyline_distance(polyline, x, y) for x, y in points)
+
+
+def points_array(points):
+    """QPoint 列表转换为 (N, 2) 数组"""
+    return np.array([(p.x(), p.y()) for p in points], dtype=float)
+
+
+@pytest.mark.parametrize('count', [2, 3, 4, 7, 12])
+def test_bezier_matrix_matches_bernstein(count):
+    control_points = random_points(count, count)
+    expected = points_array(CurveAlgorithms.bezier_curve_bernstein(control_points, 100))
+    curve = CurveAlgorithms.bezier_curve_matrix(control_points, 100, as_array=True)
+    # 参考实现把坐标截断为整数
+    assert np.all(np.abs(curve - expected) < 1.0)
+
+
+@pytest.mark.parametrize('count', [3, 4, 9])
+def test_de_casteljau_matches_matrix(count):
+    control_points = random_points(count, 10 + count)
+    curve = CurveAlgorithms.bezier_curve_de_casteljau(control_points, 64, as_array=True)
+    expected = CurveAlgorithms.bezier_curve_matrix(control_points, 64, as_array=True)
+    assert np.allclose(curve, expected)
+
+
+@pytest.mark.parametrize('count', [3, 4])
+def test_forward_difference_matches_matrix(count):
+    control_points = random_points(count, 20 + count)
+    curve = CurveAlgorithms.bezier_forward_difference(control_points, 200, as_array=True)
+    expected = CurveAlgorithms.bezier_curve_matrix(control_points, 200, as_array=True)
+    assert np.allclose(curve, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('knot_type', ['uniform', 'clamped'])
+@pytest.mark.parametrize('degree, count', [(2, 5), (3, 4), (3, 10)])
+def test_de_boor_matches_cox_de_boor(knot_type, degree, count):
+    control_points = random_points(count, 30 + count)
+    expected = points_array(CurveAlgorithms.b_spline_curve_cox_de_boor(
+        control_points, degree, 100, knot_type))
+    curve = CurveAlgorithms.b_spline_curve(control_points, degree, 100, knot_type, as_array=True)
+    assert curve.shape == expected.shape
+    assert np.all(np.abs(curve - expected) < 1.0)
+
+
+def test_flatness_measures_overshoot_along_chord():
+    # 控制点共线但越过终点：曲线到达 x≈239，远超弦线段 [0, 100]
+    control = [(0, 0), (300, 0), (300, 0), (100, 0)]
+    assert CurveAlgorithms.bezier_flatness(control) == pytest.approx(200.0)
+    coords = CurveAlgorithms.flatten_bezier_coords(control, 0.5)
+    reach = max(x for x, _ in coords)
+    true_reach = CurveAlgorithms.bezier_curve_matrix(
+        [QPoint(x, y) for x, y in control], 2000, as_array=True)[:, 0].max()
+    assert reach == pytest.approx(true_reach, abs=0.5)
+
+
+@pytest.mark.parametrize('scale', [0.5, 1.0, 5.0])
+def test_adaptive_bezier_error_bound(scale):
+    tolerance = 0.5
+    for seed in range(10):
+        control_points = random_points(4, 100 + seed)
+        polyline = CurveAlgorithms.flatten_bezier_adaptive(
+            control_points, tolerance, scale, as_array=True)
+        dense = CurveAlgorithms.bezier_curve_matrix(control_points, 2000, as_array=True)
+        assert max_distance_to_polyline(polyline, dense) <= tolerance / scale + 1e-6
+
+
+@pytest.mark.parametrize('knot_type', ['uniform', 'clamped'])
+def test_adaptive_b_spline_error_bound(knot_type):
+    tolerance = 0.5
+    for seed in range(10):
+        control_points = random_points(10, 200 + seed)
+        polyline = CurveAlgorithms.flatten_b_spline_adaptive(
+            control_points, 3, tolerance, 1.0, knot_type, as_array=True)
+        dense = CurveAlgorithms.b_spline_curve_array(
+            points_array(control_points), 3, 3000, knot_type)
+        assert max_distance_to_polyline(polyline, dense) <= tolerance + 1e-6
+
+
+
+def curve_shape(tool, control_points):
+    """构造曲线图形字典"""
+    return {'tool': tool, 'control_points': control_points, 'degree': 3,
+            'color': None, 'line_width': 2, 'fill_color': None}
+
+
+def dense_curve(shape, samples=20000):
+    """密集均匀采样的曲线，作为弧长、拾取的参考"""
+    if shape['tool'] == 'bspline_curve':
+        return CurveAlgorithms.b_spline_curve_array(points_array(shape['control_points']), 3, samples)
+    return CurveAlgorithms.bezier_curve_matrix(shape['control_points'], samples, as_array=True)
+
+
+def reference_curves():
+    """弧长、拾取测试用的曲线：含沿弦方向越过端点的三次曲线"""
+    overshoot = [QPoint(0, 0), QPoint(300, 0), QPoint(300, 0), QPoint(100, 0)]
+    shapes = [curve_shape('bezier_curve', overshoot)]
+    for seed in range(5):
+        shapes.append(curve_shape('bezier_curve', random_points(4, 300 + seed)))
+        shapes.append(curve_shape('bspline_curve', random_points(10, 400 + seed)))
+    return shapes
+
+
+@pytest.mark.parametrize('shape', reference_curves())
+def test_arc_length_matches_dense_sampling(shape):
+    dense = dense_curve(shape)
+    expected = CurveAlgorithms.arc_length_table(dense)[-1]
+    assert ShapeUtils.get_curve_length(shape) == pytest.approx(expected, rel=1e-3)
+
+
+@pytest.mark.parametrize('shape', reference_curves())
+def test_points_at_distance_lie_on_curve(shape):
+    dense = dense_curve(shape)
+    points = ShapeUtils.get_curve_points_evenly_spaced(shape, 7.0)
+    assert max_distance_to_polyline(dense, points) <= ShapeCache.GEOMETRY_TOLERANCE + 0.05
+    # 相邻点之间的弧长间隔一致，末点不超过曲线全长
+    length = CurveAlgorithms.arc_length_table(dense)[-1]
+    assert len(points) == int(ShapeUtils.get_curve_length(shape) // 7.0) + 1
+    assert (len(points) - 1) * 7.0 <= length * (1 + 1e-3)
+
+
+
+@pytest.mark.parametrize('shape', reference_curves())
+def test_pick_matches_true_curve(shape):
+    dense = dense_curve(shape, 4000)
+    tolerance = max(5, shape['line_width'] / 2 + 3)
+    # 曲线上的每个位置都能选中，包括越过弦线端点的部分
+    for x, y in dense[::20]:
+        assert ShapeUtils.is_point_in_shape(QPoint(round(x), round(y)), shape)
+    # 离曲线明显超过容差的点选不中
+    rng = random.Random(7)
+    for _ in range(300):
+        point = QPoint(rng.randint(-50, 950), rng.randint(-50, 750))
+        distance = CurveAlgorithms.polyline_distance(dense, point.x(), point.y())
+        if distance > tolerance + 0.5:
+            assert not ShapeUtils.is_point_in_shape(point, shape)
+        elif distance < tolerance - 0.5:
+            assert ShapeUtils.is_point_in_shape(point, shape)
+
+
+
+@pytest.mark.parametrize('knot_type', ['uniform', 'clamped'])
+@pytest.mark.parametrize('degree, count', [(2, 6), (3, 4), (3, 9)])
+def test_local_b_spline_update_matches_full_rebuild(knot_type, degree, count):
+    shape = curve_shape('bspline_curve', random_points(count, 500 + count))
+    shape['degree'] = degree
+    ShapeCache.b_spline_samples(shape, 100, knot_type)
+    rng = random.Random(degree * count)
+    # 首末控制点、定义域边界附近的控制点以及内部控制点
+    indices = sorted({0, 1, degree - 1, degree, count // 2, count - degree - 1, count - 2, count - 1})
+    for index in [i for i in indices if 0 <= i < count] * 2:
+        shape['control_points'][index] += QPoint(rng.randint(-60, 60), rng.randint(-60, 60))
+        assert ShapeCache.update_b_spline_point(shape, index)
+        curve = ShapeCache.b_spline_samples(shape, 100, knot_type).copy()
+        segments = ShapeCache.bezier_segments(shape, knot_type).copy()
+        
+        # 逐段重新提取Bézier形式作为参考
+        coords = [(p.x(), p.y()) for p in shape['control_points']]
+        knots = CurveAlgorithms.generate_knots(count, degree, knot_type)
+        expected = [CurveAlgorithms.b_spline_segment_to_bezier(coords, degree, knots, span)
+                    for span in CurveAlgorithms.b_spline_segment_spans(count, degree, knots)]
+        assert np.allclose(segments, expected)
+        # 增量更新连续累积，与同样控制点的新图形整体重算比较
+        rebuilt = curve_shape('bspline_curve', list(shape['control_points']))
+        rebuilt['degree'] = degree
+        assert np.allclose(curve, ShapeCache.b_spline_samples(rebuilt, 100, knot_type))
+        # 采样点都在de Boor求值的曲线上
+        dense = CurveAlgorithms.b_spline_curve_array(points_array(shape['control_points']), degree, 4000, knot_type)
+        assert max_distance_to_polyline(dense, curve) < 0.05
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,144 @@
+"""
+绘图画布测试
+在无窗口（offscreen）平台上创建画布，检查静态图层、曲面细节层次、图形空间索引等交互状态
+运行：python -m pytest test_drawing_widget.py 或 python test_drawing_widget.py
+"""
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+from PyQt5.QtCore import QPoint
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication
+
+from drawing_widget import DrawingWidget
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def surface_shape(x, y, display_mode='filled'):
+    """左上角在 (x, y) 的4×4 Bézier曲面图形"""
+    grid = [[QPoint(x + 40 * j, y + 40 * i + (15 if (i + j) % 2 else 0)) for j in range(4)]
+            for i in range(4)]
+    return {'tool': 'bezier_surface', 'control_grid': grid, 'color': QColor(0, 0, 0),
+            'line_width': 1, 'fill_color': None, 'display_mode': display_mode,
+            'fill_color1': QColor(255, 0, 0), 'fill_color2': QColor(0, 0, 255)}
+
+
+@pytest.fixture
+def widget(app):
+    widget = DrawingWidget()
+    widget.resize(800, 600)
+    widget.shapes.extend(surface_shape(20 + 200 * k, 40) for k in range(3))
+    widget.grab()
+    yield widget
+    widget.surface_lod_timer.stop()
+    widget.deleteLater()
+
+
+def test_surface_lod_is_scoped_to_dragged_shape(widget, monkeypatch):
+    dragged, other = widget.shapes[0], widget.shapes[1]
+    widget.selected_shape_index = 0
+    point = dragged['control_grid'][1][1]
+    assert widget.start_control_point_drag(point)
+    widget.drag_control_point_to(point + QPoint(6, 4))
+    widget.grab()
+    layer, key = widget.static_layer, widget.static_layer_key
+
+    assert widget.surface_lod_samples(dragged) == widget.surface_lod_levels[0]
+    assert widget.surface_lod_samples(other) is None
+
+    # 细化只重绘被拖拽曲面的范围，不整体重绘，静态图层保持不变
+    requests = []
+    monkeypatch.setattr(widget, 'update', lambda *args: requests.append(args))
+    while widget.surface_lod_level is not None:
+        widget.refine_surface_lod()
+        widget.grab()
+        assert widget.static_layer is layer and widget.static_layer_key == key
+    assert requests and all(args for args in requests)
+
+    widget.end_control_point_drag()
+    assert widget.surface_lod_samples(dragged) is None
+
+
+def rect_shape(x, y, width, height):
+    """矩形图形"""
+    return {'tool': 'rect', 'start': QPoint(x, y), 'end': QPoint(x + width, y + height),
+            'color': QColor(0, 0, 0), 'line_width': 2, 'fill_color': None}
+
+
+def assert_index_in_sync(widget):
+    """空间索引登记的范围与每个图形当前的重绘范围一致"""
+    widget.sync_shape_index()
+    assert len(widget.shape_index) == len(widget.shapes)
+    for i, shape in enumerate(widget.shapes):
+        assert widget.shape_index.rects[i] == widget._rect_tuple(widget.shape_dirty_rect(shape))
+
+
+def test_selection_prefers_topmost_shape(app):
+    widget = DrawingWidget()
+    widget.shapes.extend([rect_shape(0, 0, 200, 200), rect_shape(50, 50, 100, 100), rect_shape(300, 0, 50, 50)])
+    # 重叠处后绘制的图形在上层
+    assert widget.select_shape_at_point(QPoint(80, 80)) and widget.selected_shape_index == 1
+    assert widget.select_shape_at_point(QPoint(10, 10)) and widget.selected_shape_index == 0
+    widget.shapes.append(rect_shape(60, 60, 30, 30))
+    assert widget.select_shape_at_point(QPoint(80, 80)) and widget.selected_shape_index == 3
+    assert not widget.select_shape_at_point(QPoint(250, 250))
+
+
+def test_shape_index_follows_moves_transforms_and_deletes(app):
+    widget = DrawingWidget()
+    widget.shapes.extend(rect_shape(100 * k, 40 * k, 60, 40) for k in range(6))
+    assert_index_in_sync(widget)
+
+    # 拖动图形
+    assert widget.select_shape_at_point(QPoint(220, 100))
+    widget.start_dragging(QPoint(220, 100))
+    widget.drag_shape_to(QPoint(520, 400))
+    widget.end_dragging()
+    assert_index_in_sync(widget)
+    assert widget.select_shape_at_point(QPoint(520, 400)) and widget.selected_shape_index == 2
+
+    # 平移、旋转、缩放
+    for transform, params in [('translate', {'dx': 300, 'dy': -80}), ('rotate', {'angle': 30}),
+                              ('scale', {'sx': 2.0, 'sy': 0.5})]:
+        widget.apply_transform_to_selected(transform, **params)
+        assert_index_in_sync(widget)
+
+    # 删除图形后其后的下标前移，删除后再新增同样数量的图形也能发现
+    del widget.shapes[1]
+    assert_index_in_sync(widget)
+    del widget.shapes[0]
+    widget.shapes.append(rect_shape(700, 500, 50, 50))
+    assert_index_in_sync(widget)
+    assert widget.select_shape_at_point(QPoint(720, 520)) and widget.selected_shape_index == len(widget.shapes) - 1
+    # 整个列表被替换
+    widget.shapes = [rect_shape(0, 0, 10, 10)]
+    assert_index_in_sync(widget)
+
+
+def test_find_control_point_after_drag(app):
+    widget = DrawingWidget()
+    widget.shapes.append(surface_shape(100, 100, 'wireframe'))
+    widget.selected_shape_index = 0
+    old = QPoint(widget.shapes[0]['control_grid'][2][1])
+    assert widget.find_control_point_at(old) == {'type': 'surface', 'row': 2, 'col': 1}
+    assert widget.start_control_point_drag(old)
+    new = old + QPoint(150, 90)
+    widget.drag_control_point_to(new)
+    widget.end_control_point_drag()
+    widget.surface_lod_timer.stop()
+    # 控制点索引随几何版本重建：旧位置查不到，新位置能找到
+    assert widget.find_control_point_at(new) == {'type': 'surface', 'row': 2, 'col': 1}
+    assert widget.find_control_point_at(old) != {'type': 'surface', 'row': 2, 'col': 1}
+    assert widget.find_control_point_at(new + QPoint(6, 0)) is not None
+    assert widget.find_control_point_at(new + QPoint(20, 20)) is None
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
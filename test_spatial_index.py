@@ -0,0 +1,85 @@
+"""
+空间索引测试
+均匀网格的登记、更新、删除与按点、按矩形查询，与逐个检查边界矩形的结果对比
+运行：python -m pytest test_spatial_index.py 或 python test_spatial_index.py
+"""
+import random
+
+import pytest
+
+from spatial_index import SpatialIndex
+
+
+def random_rect(rng, extent=500, size=120):
+    """随机边界矩形 (x0, y0, x1, y1)，可能跨越多个格子或落在负坐标上"""
+    x0, y0 = rng.uniform(-extent, extent), rng.uniform(-extent, extent)
+    return (x0, y0, x0 + rng.uniform(0, size), y0 + rng.uniform(0, size))
+
+
+def brute_point(rects, x, y):
+    return {key for key, r in rects.items() if r[0] <= x <= r[2] and r[1] <= y <= r[3]}
+
+
+def brute_rect(rects, query):
+    x0, y0, x1, y1 = query
+    return {key for key, r in rects.items() if r[0] <= x1 and x0 <= r[2] and r[1] <= y1 and y0 <= r[3]}
+
+
+def test_queries_on_cell_boundaries():
+    index = SpatialIndex(64.0)
+    index.insert('a', (0, 0, 64, 64))      # 右下边界恰好落在相邻格子上
+    index.insert('b', (64, 64, 100, 100))
+    index.insert('c', (-10, -10, -1, -1))  # 负坐标的格子
+    assert set(index.query_point(64, 64)) == {'a', 'b'}
+    assert set(index.query_point(63.9, 10)) == {'a'}
+    assert set(index.query_point(-1, -1)) == {'c'}
+    assert index.query_point(-0.5, -0.5) == []
+    assert index.query_rect((-1, -1, 0, 0)) == {'a', 'c'}
+    assert index.query_rect((65, 0, 200, 63)) == set()
+
+
+def test_update_and_remove_keep_cells_consistent():
+    index = SpatialIndex(32.0)
+    index.insert(1, (0, 0, 10, 10))
+    index.update(1, (2, 2, 12, 12))        # 仍在同一格子内，只替换矩形
+    assert index.rects[1] == (2, 2, 12, 12)
+    index.update(1, (100, 100, 140, 110))  # 移到其他格子
+    assert index.query_point(5, 5) == []
+    assert index.query_point(130, 105) == [1]
+    assert 1 not in index.cells.get((0, 0), ())
+    index.insert(1, (0, 0, 5, 5))          # 重复登记替换原有矩形
+    assert index.query_point(130, 105) == [] and index.query_point(1, 1) == [1]
+    index.remove(1)
+    index.remove(1)                        # 不存在的键不做任何事
+    assert len(index) == 0 and index.cells == {}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_queries_match_brute_force(seed):
+    rng = random.Random(seed)
+    index = SpatialIndex(64.0)
+    rects = {}
+    for key in range(300):
+        rects[key] = random_rect(rng)
+        index.insert(key, rects[key])
+    # 随机移动、删除一部分对象
+    for key in rng.sample(range(300), 100):
+        rects[key] = random_rect(rng)
+        index.update(key, rects[key])
+    for key in rng.sample(range(300), 50):
+        del rects[key]
+        index.remove(key)
+    assert len(index) == len(rects)
+
+    for _ in range(200):
+        x, y = rng.uniform(-550, 650), rng.uniform(-550, 650)
+        assert set(index.query_point(x, y)) == brute_point(rects, x, y)
+    # 小范围查询逐格检查，覆盖全部对象的大范围查询遍历已占用的格子
+    for size in (30, 200, 5000):
+        for _ in range(50):
+            query = random_rect(rng, 600, size)
+            assert index.query_rect(query) == brute_rect(rects, query)
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,376 @@
+"""
+曲面算法测试
+将向量化的三角形光栅化与逐像素、扫描线的参考实现对比，检查共享边既不重叠也不留缝，
+深度缓冲区消隐的结果与三角形的顺序无关、自适应细分的误差界，
+以及拖拽控制点时秩1增量更新与整体重算一致
+运行：python -m pytest test_surfaces.py 或 python test_surfaces.py
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPoint
+from PyQt5.QtGui import QColor
+
+from shape_cache import ShapeCache
+from surface_algorithms import SurfaceAlgorithms
+
+
+def random_mesh(count, seed, size=120):
+    """生成固定随机种子的三角形网格（各三角形独立，可能相互重叠）"""
+    rng = np.random.default_rng(seed)
+    vertices = rng.uniform(-10, size + 10, (count * 3, 2))
+    colors = rng.uniform(0, 255, (count * 3, 4))
+    colors[:, 3] = 255
+    triangles = np.arange(count * 3).reshape(-1, 3)
+    return vertices, colors, triangles
+
+
+def grid_mesh(rows, cols, spacing, seed):
+    """
+    规则网格的三角剖分，内部顶点随机扰动，部分顶点落在像素中心上
+    :return: (vertices, triangles)
+    """
+    rng = random.Random(seed)
+    vertices = []
+    for i in range(rows + 1):
+        for j in range(cols + 1):
+            x, y = 3 + j * spacing, 3 + i * spacing
+            if 0 < i < rows and 0 < j < cols:
+                # 扰动不超过间距的八分之一，三个顶点同时移动也越不过四边形的对角线
+                jitter = spacing / 8
+                snapped = math.floor(x) + 0.5, math.floor(y) + 0.5
+                if rng.random() < 0.5 and max(abs(snapped[0] - x), abs(snapped[1] - y)) < jitter:
+                    x, y = snapped
+                else:
+                    x += rng.uniform(-jitter, jitter)
+                    y += rng.uniform(-jitter, jitter)
+            vertices.append((x, y))
+    vertices = np.array(vertices)
+    triangles = np.asarray(SurfaceAlgorithms.grid_triangles(rows + 1, cols + 1))
+    a, b, c = (vertices[triangles[:, k]] for k in range(3))
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    assert np.all(area > 0) or np.all(area < 0), '网格发生翻折'
+    return vertices, triangles
+
+
+def reference_raster(width, height, vertices, colors, triangles):
+    """
+    逐像素的参考光栅化：像素中心在三角形内部（严格）时按重心坐标插值颜色，后画的覆盖先画的
+    只用于顶点不落在像素中心连线上的随机网格，边界上的像素不计入
+    """
+    buffer = np.zeros((height, width, 4), dtype=np.uint8)
+    for triangle in triangles:
+        (x0, y0), (x1, y1), (x2, y2) = vertices[triangle]
+        area = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+        if area == 0:
+            continue
+        for row in range(height):
+            for column in range(width):
+                px, py = column + 0.5, row + 0.5
+                w0 = ((x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)) / area
+                w1 = ((x0 - x2) * (py - y2) - (y0 - y2) * (px - x2)) / area
+                w2 = 1 - w0 - w1
+                if w0 > 0 and w1 > 0 and w2 > 0:
+                    rgba = w0 * colors[triangle[0]] + w1 * colors[triangle[1]] + w2 * colors[triangle[2]]
+                    buffer[row, column] = np.clip(rgba + 0.5, 0, 255).astype(np.uint8)
+    return buffer
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_rasterize_matches_reference(seed):
+    vertices, colors, triangles = random_mesh(6, seed, 60)
+    buffer = SurfaceAlgorithms.create_pixel_buffer(60, 50)
+    SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, triangles)
+    expected = reference_raster(60, 50, vertices, colors, triangles)
+    assert np.array_equal(buffer[..., 3] > 0, expected[..., 3] > 0)
+    assert np.abs(buffer.astype(int) - expected).max() <= 1
+
+
+
+def dilate(mask):
+    """二值图像按8邻域膨胀一个像素"""
+    padded = np.pad(mask, 1)
+    result = np.zeros_like(mask)
+    for dy in range(3):
+        for dx in range(3):
+            result |= padded[dy:dy + mask.shape[0], dx:dx + mask.shape[1]]
+    return result
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_rasterize_triangle_matches_scan_line_fill(seed):
+    # 扫描线参考实现在整数坐标（像素角点）上采样且截断交点，边界相差不超过一个像素，
+    # 颜色相差不超过半个像素加一个像素截断带来的渐变量
+    rng = random.Random(seed)
+    points = [QPoint(rng.randint(5, 110), rng.randint(5, 110)) for _ in range(3)]
+    colors = [QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)) for _ in range(3)]
+    corners = np.array([(p.x(), p.y(), 1.0) for p in points])
+    if abs(np.linalg.det(corners)) < 1e-9:
+        return
+    expected = np.zeros((120, 120, 4), dtype=np.uint8)
+    for point, color in SurfaceAlgorithms.scan_line_fill_triangle(*points, *colors):
+        expected[point.y(), point.x()] = (color.red(), color.green(), color.blue(), 255)
+    buffer = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    SurfaceAlgorithms.rasterize_triangle(buffer, *[(p.x(), p.y()) for p in points], *colors)
+    
+    covered, reference = buffer[..., 3] > 0, expected[..., 3] > 0
+    assert not np.any(covered & ~dilate(reference))
+    # 以像素中心采样，覆盖的像素数接近三角形面积
+    area = abs(np.linalg.det(corners)) / 2
+    perimeter = sum(np.hypot(*(corners[i, :2] - corners[i - 1, :2])) for i in range(3))
+    assert abs(covered.sum() - area) <= perimeter / 2
+    
+    gradient = np.linalg.solve(corners, [(c.red(), c.green(), c.blue()) for c in colors])
+    bound = 1.5 * np.abs(gradient[0]) + 0.5 * np.abs(gradient[1]) + 2
+    both = covered & reference
+    assert np.all(np.abs(buffer[both, :3].astype(int) - expected[both, :3]) <= bound)
+
+
+@pytest.mark.parametrize('batch_pixels', [64, 1 << 18])
+def test_rasterize_batches_cover_same_pixels(monkeypatch, batch_pixels):
+    vertices, colors, triangles = random_mesh(40, 11)
+    expected = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    SurfaceAlgorithms.rasterize_triangles(expected, vertices, colors, triangles)
+    monkeypatch.setattr(SurfaceAlgorithms, 'RASTER_BATCH_PIXELS', batch_pixels)
+    buffer = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, triangles)
+    assert np.array_equal(buffer, expected)
+
+
+@pytest.mark.parametrize('spacing', [2.0, 3.0, 8.0])
+@pytest.mark.parametrize('seed', range(3))
+def test_shared_edges_have_no_overlap_or_gap(spacing, seed):
+    rows = cols = int(60 // spacing)
+    vertices, triangles = grid_mesh(rows, cols, spacing, seed)
+    size = int(6 + cols * spacing) + 2
+    colors = np.full((len(vertices), 4), 255.0)
+    # 每个三角形单独光栅化，统计每个像素被覆盖的次数
+    coverage = np.zeros((size, size), dtype=int)
+    for triangle in triangles:
+        buffer = SurfaceAlgorithms.create_pixel_buffer(size, size)
+        SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, [triangle])
+        coverage += buffer[..., 3] > 0
+    assert coverage.max() == 1
+    # 网格外边界以内的像素中心全部被覆盖
+    centers = np.arange(size) + 0.5
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    inside_x = (centers > low[0]) & (centers < high[0])
+    inside_y = (centers > low[1]) & (centers < high[1])
+    assert np.all(coverage[np.ix_(inside_y, inside_x)] == 1)
+    # 整个网格一次光栅化的结果与逐个三角形的并集一致
+    buffer = SurfaceAlgorithms.create_pixel_buffer(size, size)
+    SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, triangles)
+    assert np.array_equal(buffer[..., 3] > 0, coverage > 0)
+
+
+def test_rasterize_triangle_fan_around_pixel_center():
+    # 所有三角形共享落在像素中心上的顶点，该像素恰好只归属一个三角形
+    center = np.array([10.5, 10.5])
+    angles = np.linspace(0, 2 * np.pi, 9)[:-1]
+    ring = center + 8 * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    vertices = np.vstack([center, ring])
+    triangles = [(0, 1 + i, 1 + (i + 1) % 8) for i in range(8)]
+    colors = np.full((len(vertices), 4), 255.0)
+    coverage = np.zeros((21, 21), dtype=int)
+    for triangle in triangles:
+        buffer = SurfaceAlgorithms.create_pixel_buffer(21, 21)
+        SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, [triangle])
+        coverage += buffer[..., 3] > 0
+    assert coverage[10, 10] == 1
+    assert coverage.max() == 1
+
+
+
+def reference_depth_raster(width, height, vertices, colors, triangles, depths):
+    """逐像素的参考深度消隐：像素中心（严格在内部）取插值深度最大的三角形的颜色"""
+    buffer = np.zeros((height, width, 4), dtype=np.uint8)
+    nearest = np.full((height, width), -np.inf)
+    for triangle in triangles:
+        (x0, y0), (x1, y1), (x2, y2) = vertices[triangle]
+        area = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+        if area == 0:
+            continue
+        for row in range(height):
+            for column in range(width):
+                px, py = column + 0.5, row + 0.5
+                w0 = ((x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)) / area
+                w1 = ((x0 - x2) * (py - y2) - (y0 - y2) * (px - x2)) / area
+                w2 = 1 - w0 - w1
+                z = w0 * depths[triangle[0]] + w1 * depths[triangle[1]] + w2 * depths[triangle[2]]
+                if w0 > 0 and w1 > 0 and w2 > 0 and z > nearest[row, column]:
+                    nearest[row, column] = z
+                    rgba = w0 * colors[triangle[0]] + w1 * colors[triangle[1]] + w2 * colors[triangle[2]]
+                    buffer[row, column] = np.clip(rgba + 0.5, 0, 255).astype(np.uint8)
+    return buffer
+
+
+def depth_mesh(count, seed, size=120):
+    """相互穿插的三角形网格及顶点深度"""
+    vertices, colors, triangles = random_mesh(count, seed, size)
+    depths = np.random.default_rng(seed + 1000).uniform(-50, 50, len(vertices))
+    return vertices, colors, triangles, depths
+
+
+@pytest.mark.parametrize('seed', range(2))
+def test_depth_buffer_matches_reference(seed):
+    vertices, colors, triangles, depths = depth_mesh(6, seed, 50)
+    buffer = SurfaceAlgorithms.create_pixel_buffer(50, 40)
+    SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, triangles, depths=depths)
+    expected = reference_depth_raster(50, 40, vertices, colors, triangles, depths)
+    assert np.array_equal(buffer[..., 3] > 0, expected[..., 3] > 0)
+    assert np.abs(buffer.astype(int) - expected).max() <= 1
+
+
+@pytest.mark.parametrize('batch_pixels', [64, 1 << 18])
+@pytest.mark.parametrize('seed', range(3))
+def test_depth_buffer_independent_of_triangle_order(monkeypatch, batch_pixels, seed):
+    monkeypatch.setattr(SurfaceAlgorithms, 'RASTER_BATCH_PIXELS', batch_pixels)
+    vertices, colors, triangles, depths = depth_mesh(40, seed)
+    expected = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    SurfaceAlgorithms.rasterize_triangles(expected, vertices, colors, triangles, depths=depths)
+    for order in (triangles[::-1], np.random.default_rng(seed).permutation(triangles)):
+        buffer = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+        SurfaceAlgorithms.rasterize_triangles(buffer, vertices, colors, order, depths=depths)
+        assert np.array_equal(buffer, expected)
+
+
+def test_depth_buffer_shared_between_calls():
+    # 逐个三角形调用并共享深度缓冲区，与整个网格一次光栅化的结果一致
+    vertices, colors, triangles, depths = depth_mesh(20, 5)
+    expected = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    SurfaceAlgorithms.rasterize_triangles(expected, vertices, colors, triangles, depths=depths)
+    buffer = SurfaceAlgorithms.create_pixel_buffer(120, 120)
+    depth_buffer = np.full((120, 120), -np.inf)
+    for i0, i1, i2 in triangles[::-1]:
+        SurfaceAlgorithms.rasterize_triangle(
+            buffer, vertices[i0], vertices[i1], vertices[i2], colors[i0], colors[i1], colors[i2],
+            depth_buffer, depths[[i0, i1, i2]])
+    assert np.array_equal(buffer, expected)
+
+
+
+def warped_patch():
+    """双三次平面片，只把一个角点拉离平面"""
+    u, v = np.meshgrid(np.linspace(0, 400, 4), np.linspace(0, 300, 4), indexing='ij')
+    control = np.stack([u, v], axis=-1)
+    control[0, 0] += (150, -120)
+    return control
+
+
+def tessellation_error(control, u_params, v_params, samples=160):
+    """曲面与非均匀参数网格三角化（每格按对角线 p00-p11 拆分）之间在相同参数处的最大距离"""
+    u = np.linspace(0, 1, samples)
+    v = np.linspace(0, 1, samples)
+    exact = SurfaceAlgorithms.bezier_surface_at(control, u, v)[0]
+    grid = SurfaceAlgorithms.bezier_surface_at(control, u_params, v_params)[0]
+    i = np.clip(np.searchsorted(u_params, u, side='right') - 1, 0, len(u_params) - 2)[:, None]
+    j = np.clip(np.searchsorted(v_params, v, side='right') - 1, 0, len(v_params) - 2)[None, :]
+    s = ((u[:, None] - u_params[i]) / (u_params[i + 1] - u_params[i]))[..., None]
+    t = ((v[None, :] - v_params[j]) / (v_params[j + 1] - v_params[j]))[..., None]
+    p00, p10, p11, p01 = grid[i, j], grid[i + 1, j], grid[i + 1, j + 1], grid[i, j + 1]
+    approx = np.where(s >= t, p00 + s * (p10 - p00) + t * (p11 - p10),
+                      p00 + t * (p01 - p00) + s * (p11 - p01))
+    return np.hypot(*np.moveaxis(approx - exact, -1, 0)).max()
+
+
+@pytest.mark.parametrize('tolerance', [0.5, 2.0])
+def test_adaptive_surface_error_bound(tolerance):
+    control = warped_patch()
+    u_params, v_params = SurfaceAlgorithms.adaptive_surface_parameters(control, tolerance)
+    assert tessellation_error(control, u_params, v_params) <= tolerance
+
+
+def test_adaptive_surface_refines_only_near_warp():
+    control = warped_patch()
+    u_params, v_params = SurfaceAlgorithms.adaptive_surface_parameters(control, 0.5)
+    # 一个角点的翻翘不会把整个曲面推到最大深度
+    assert len(u_params) * len(v_params) < (2 ** 6 + 1) ** 2 / 2
+    # 翻翘的角点在 u=v=0 处，那里的参数间隔比远离它的一端更密
+    for params in (u_params, v_params):
+        steps = np.diff(params)
+        assert steps[0] < steps[-1]
+    # 平坦的曲面只有最小深度的网格线
+    flat = np.stack(np.meshgrid(np.linspace(0, 400, 4), np.linspace(0, 300, 4), indexing='ij'), axis=-1)
+    u_params, v_params = SurfaceAlgorithms.adaptive_surface_parameters(flat, 0.5)
+    assert len(u_params) == len(v_params) == 5
+
+
+
+
+def surface_shape(tool, rows, cols, seed, **options):
+    """构造控制网格随机扰动的曲面图形字典"""
+    rng = random.Random(seed)
+    control_grid = [[QPoint(80 * j + rng.randint(-30, 30), 60 * i + rng.randint(-30, 30))
+                     for j in range(cols)] for i in range(rows)]
+    return dict(tool=tool, control_grid=control_grid, **options)
+
+
+def surface_samples(shape, u_samples=24, v_samples=18):
+    """按图形类型取缓存的采样网格"""
+    if shape['tool'] == 'bspline_surface':
+        return ShapeCache.b_spline_surface_samples(shape, u_samples, v_samples)
+    return ShapeCache.bezier_surface_samples(shape, u_samples, v_samples)
+
+
+@pytest.mark.parametrize('shape', [
+    surface_shape('bezier_surface', 4, 4, 1),
+    surface_shape('bezier_surface', 5, 3, 2),
+    surface_shape('bspline_surface', 7, 6, 3, degree=3, knot_type='clamped'),
+    surface_shape('bspline_surface', 6, 8, 4, degree=2, knot_type='uniform'),
+], ids=['bezier4x4', 'bezier5x3', 'bspline-clamped', 'bspline-uniform'])
+def test_rank_one_update_matches_full_evaluation(shape):
+    surface_samples(shape)
+    rng = random.Random(5)
+    rows, cols = len(shape['control_grid']), len(shape['control_grid'][0])
+    for _ in range(12):
+        row, col = rng.randrange(rows), rng.randrange(cols)
+        point = shape['control_grid'][row][col]
+        shape['control_grid'][row][col] = point + QPoint(rng.randint(-40, 40), rng.randint(-40, 40))
+        assert ShapeCache.update_surface_point(shape, row, col)
+        updated = surface_samples(shape).copy()
+        # 清除缓存后整体重算作为参考
+        ShapeCache.invalidate(shape)
+        expected = surface_samples(shape)
+        assert np.allclose(updated, expected, atol=1e-9)
+
+
+def test_rank_one_update_skips_stale_or_adaptive_cache():
+    shape = surface_shape('bezier_surface', 4, 4, 6)
+    ShapeCache.bezier_surface_samples(shape, 10, 10)
+    ShapeCache.bump_version(shape)
+    # 缓存对应的是旧版本，不能在其上叠加增量
+    shape['control_grid'][1][2] += QPoint(10, 0)
+    assert not ShapeCache.update_surface_point(shape, 1, 2)
+    ShapeCache.bezier_surface_adaptive(shape, 0.5, 1.0)
+    shape['control_grid'][1][2] += QPoint(10, 0)
+    assert not ShapeCache.update_surface_point(shape, 1, 2)
+    # 下次取样时整体重算
+    expected = SurfaceAlgorithms.bezier_surface_matrix(shape['control_grid'], 10, 10)['points']
+    assert np.allclose(ShapeCache.bezier_surface_samples(shape, 10, 10), expected)
+
+
+def test_precomputed_tables_are_bounded():
+    for size in range(2, 200):
+        SurfaceAlgorithms.grid_triangles(size, size + 1)
+    cache = SurfaceAlgorithms._grid_triangles_cache
+    assert len(cache) <= cache.capacity
+    # 最近用到的条目保留，最久未用的被淘汰
+    assert (199, 200) in cache and (2, 3) not in cache
+
+
+def test_bump_version_releases_stale_entries():
+    control_grid = [[QPoint(100 * j, 80 * i) for j in range(4)] for i in range(4)]
+    shape = {'tool': 'bezier_surface', 'control_grid': control_grid}
+    ShapeCache.bezier_surface_samples(shape, 10, 10)
+    ShapeCache.surface_image(shape, QColor(255, 0, 0), QColor(0, 0, 255), 1.0)
+    ShapeCache.shape_bounds(shape)
+    ShapeCache.bump_version(shape)
+    # 图像、包围盒等依赖旧版本的缓存立即释放，采样网格留给秩1更新在原处改写
+    assert set(shape['cache']) <= set(ShapeCache.INCREMENTAL_ENTRIES)
+    assert 'surface' in shape['cache']
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))